@@ -0,0 +1,118 @@
+"""
+chatlog rendering of a synthetic 2000 message log: a new Markdown converter and uncompiled patterns per call
+against the helpers in jinja_utils, rendered in a worker thread like the cog does
+
+    pipenv run python bench/chatlog_render.py [messages] | tee bench_output.txt
+"""
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "clubhouse"))
+
+from jinja2 import Environment, FileSystemLoader, Markup  # noqa: E402
+from markdown import Markdown  # noqa: E402
+
+from jinja_utils import regex_replace, render_markdown, add_mention_suffix  # noqa: E402
+
+TEMPLATES = Path(__file__).resolve().parent.parent / "clubhouse" / "templates"
+NAMES = {str(user_id): f"user{user_id}" for user_id in range(50)}
+TUTORIAL = (
+    "Hallo <@!1> und <@2>, **willkommen**! ~~alt~~\n\n"
+    "* Punkt eins\n* Punkt zwei\n\n"
+    "Schreibt `.close` wenn ihr fertig seid."
+)
+
+
+def synthetic_log(count: int) -> List[dict]:
+    # every tenth message is the tutorial embed with mentions
+    messages = []
+    for i in range(count):
+        if i % 10 == 0:
+            embeds = [{"title": "Tutorial", "description": TUTORIAL, "fields": [("Feld", "Text <@3>")]}]
+            messages.append({"content": "<@1> <@2>", "embeds": embeds})
+        else:
+            messages.append({"content": f"Nachricht {i} von <@{i % 50}> mit *markdown* ~~x~~", "embeds": []})
+    return messages
+
+
+def template_data(message: dict, suffix: Callable[[str], str]) -> dict:
+    return {
+        "id": 1,
+        "bot": False,
+        "attachments": [],
+        "embeds": [{
+            "title": suffix(embed["title"]),
+            "description": suffix(embed["description"]),
+            "color": 0,
+            "thumbnail": "",
+            "fields": [{"title": suffix(name), "description": suffix(value)} for name, value in embed["fields"]],
+        } for embed in message["embeds"]],
+        "author": {"id": 1, "name": "author", "avatar": ""},
+        "timestamp": "2021-01-01 00:00:00",
+        "content": suffix(message["content"]),
+        "reactions": [],
+    }
+
+
+def old_environment() -> Tuple[Environment, Callable[[str], str]]:
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES)))
+    env.filters["regexr"] = lambda s: re.sub(r"~~(.*?)~~", r"<strike>\1</strike>", s)
+    env.filters["markdown"] = lambda text: Markup(Markdown(extensions=["meta"]).convert(text))
+
+    def suffix(s):
+        if not isinstance(s, str):
+            return ""
+        return re.sub(r"<@!?(\d*?)>", lambda x: f"<@{x.group(1)}> ({NAMES.get(x.group(1), 'unknown')})", s)
+
+    return env, suffix
+
+
+def new_environment() -> Tuple[Environment, Callable[[str], str]]:
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES)))
+    env.filters["regexr"] = regex_replace
+    env.filters["markdown"] = render_markdown
+    names: Dict[str, str] = {}
+
+    def member_name(user_id: str) -> str:
+        if user_id not in names:
+            names[user_id] = NAMES.get(user_id, "unknown")
+        return names[user_id]
+
+    return env, lambda s: add_mention_suffix(s, member_name)
+
+
+def render(environment: Callable[[], Tuple[Environment, Callable[[str], str]]], messages: List[dict]) -> str:
+    env, suffix = environment()
+    return "".join(env.get_template("chatlog.html").generate(
+        guild={"name": "guild", "icon": ""},
+        channel_name="channel",
+        message_count=len(messages),
+        messages=(template_data(message, suffix) for message in messages),
+    ))
+
+
+def timed(executor: ThreadPoolExecutor, environment, messages: List[dict]) -> Tuple[float, str]:
+    start = perf_counter()
+    html = executor.submit(render, environment, messages).result()
+    return perf_counter() - start, html
+
+
+def main():
+    messages = synthetic_log(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    with ThreadPoolExecutor(1) as executor:
+        old_time, old_html = timed(executor, old_environment, messages)
+        cold_time, new_html = timed(executor, new_environment, messages)
+        warm_time, _ = timed(executor, new_environment, messages)
+    print(f"{len(messages)} messages")
+    print(f"  before:            {old_time:.3f}s")
+    print(f"  after, cold cache: {cold_time:.3f}s")
+    print(f"  after, warm cache: {warm_time:.3f}s")
+    print(f"  identical html:    {old_html == new_html}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+query plans and timings of the queue and channel queries on a seeded SQLite database,
+with the indexes added by the migrations and without any of them
+
+    pipenv run python bench/query_plans.py [users] | tee bench_output.txt
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "clubhouse"))
+
+from PyDrocsid.database import db  # noqa: E402
+from sqlalchemy import create_engine, func, or_  # noqa: E402
+from sqlalchemy.orm import Query, Session  # noqa: E402
+
+from models.channel import Channel  # noqa: E402
+from models.donator import Donator  # noqa: E402
+from models.searcher import Searcher  # noqa: E402
+from models.state import State  # noqa: E402
+
+# every index the migrations add to these tables, dropped for the baseline
+INDEXES = [
+    "ix_searcher_state_enqueued_at",
+    "ix_donator_state_last_contact",
+    "ix_donator_state_next_reminder_at",
+    "ix_channel_searcher_id",
+    "ix_channel_donator_id",
+]
+CHANNELS = 2000
+RUNS = 5
+
+
+def seed(session: Session, users: int):
+    base = datetime(2021, 1, 1)
+
+    def state() -> State:
+        # most rows belong to users that are done
+        return State.DONE if random.random() < 0.95 else random.choice([State.INITIAL, State.QUEUED, State.MATCHED])
+
+    session.bulk_insert_mappings(Searcher, [
+        {"user_id": user_id, "state": state(), "enqueued_at": base + timedelta(seconds=random.randint(0, 10 ** 7))}
+        for user_id in range(users)
+    ])
+    session.bulk_insert_mappings(Donator, [
+        {
+            "user_id": users + user_id,
+            "state": (donator_state := state()),
+            "invite_count": (count := random.randint(1, 5)),
+            "used_invites": random.randint(0, count),
+            "last_contact": base + timedelta(seconds=random.randint(0, 10 ** 7)),
+            # only donators that still have to enter their invite count get reminders
+            "next_reminder_at": base + timedelta(seconds=random.randint(0, 10 ** 7))
+            if donator_state == State.INITIAL else None,
+        }
+        for user_id in range(users)
+    ])
+    session.bulk_insert_mappings(Channel, [
+        {
+            "channel_id": channel_id,
+            "searcher_id": random.randrange(users),
+            "donator_id": users + random.randrange(users),
+        }
+        for channel_id in range(CHANNELS)
+    ])
+    session.commit()
+
+
+def queries(users: int) -> List[Tuple[str, Callable[[Session], Query]]]:
+    user_id = users + random.randrange(users)
+    return [
+        ("queued searchers ordered", lambda session: session.query(Searcher)
+            .filter(Searcher.state == State.QUEUED)
+            .order_by(Searcher.enqueued_at)),
+        ("channels of a user (OR)", lambda session: session.query(Channel)
+            .filter(or_(Channel.donator_id == user_id, Channel.searcher_id == user_id))),
+        ("donator channel count", lambda session: session.query(func.count(Channel.channel_id))
+            .filter_by(donator_id=user_id)),
+        ("eligible donators", lambda session: session.query(Donator)
+            .filter(Donator.used_invites < Donator.invite_count)
+            .filter(Donator.state.in_((State.MATCHED, State.QUEUED)))),
+        ("donators waiting for reminders", lambda session: session.query(Donator.user_id, Donator.next_reminder_at)
+            .filter(Donator.state == State.INITIAL)
+            .filter(Donator.next_reminder_at.isnot(None))),
+    ]
+
+
+def measure(session: Session, users: int):
+    for name, build in queries(users):
+        # the plain sql is timed, loading the rows into objects would hide the difference
+        sql = str(build(session).statement.compile(session.bind, compile_kwargs={"literal_binds": True}))
+        plan = "; ".join(row[-1] for row in session.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        times = []
+        for _ in range(RUNS):
+            start = perf_counter()
+            session.execute(sql).fetchall()
+            times.append(perf_counter() - start)
+        print(f"  {name:<30} {median(times) * 1000:8.2f}ms  {plan}")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    random.seed(0)
+    engine = create_engine("sqlite://")
+    db.Base.metadata.create_all(engine, tables=[Searcher.__table__, Donator.__table__, Channel.__table__])
+    session = Session(bind=engine)
+    seed(session, users)
+    session.execute("ANALYZE")
+
+    print(f"{users} searchers and donators, {CHANNELS} channels")
+    print("with indexes:")
+    measure(session, users)
+
+    for index in INDEXES:
+        session.execute(f"DROP INDEX {index}")
+    session.execute("ANALYZE")
+    print("without indexes:")
+    measure(session, users)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+queue ordering: the old cmp_to_key comparator against the precomputed sort keys of the queue index
+
+    pipenv run python bench/queue_order.py [sizes...] | tee bench_output.txt
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from functools import cmp_to_key
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "clubhouse"))
+
+from discord import Status  # noqa: E402
+
+from models.searcher import Searcher  # noqa: E402
+from models.state import State  # noqa: E402
+from queue_index import QueueIndex  # noqa: E402
+
+STATUSES = [Status.online, Status.idle, Status.dnd, Status.offline]
+MOVES = 2000
+
+
+class Guild:
+    def __init__(self, members: Dict[int, SimpleNamespace]):
+        self.members = members
+
+    def get_member(self, user_id: int) -> Optional[SimpleNamespace]:
+        return self.members.get(user_id)
+
+
+def comparator_sort(guild: Guild, searchers: List[Searcher]) -> List[Searcher]:
+    """
+    the ordering calculate_queues used before the queue index
+    """
+
+    def sort_users(x: Searcher, y: Searcher) -> int:
+        user_x = guild.get_member(x.user_id)
+        if user_x is None:
+            return 1
+        user_y = guild.get_member(y.user_id)
+        if user_y is None:
+            return -1
+        if user_x.status == Status.offline and user_y.status == Status.offline or \
+                user_x.status != Status.offline and user_y.status != Status.offline:
+            if user_x.status == Status.online and user_y.status != Status.online:
+                return -1
+            elif user_x.status != Status.online and user_y.status == Status.online:
+                return 1
+            return int(x.enqueued_at.timestamp() - y.enqueued_at.timestamp())
+        elif user_x.status == Status.offline:
+            return 1
+        return -1
+
+    return sorted(searchers, key=cmp_to_key(sort_users))
+
+
+def run(size: int):
+    # every 50th searcher is no longer a member of the guild
+    members = {
+        user_id: SimpleNamespace(id=user_id, status=random.choice(STATUSES)) for user_id in range(size) if user_id % 50
+    }
+    guild = Guild(members)
+    base = datetime(2021, 1, 1)
+    searchers = [
+        Searcher(user_id=user_id, state=State.QUEUED, enqueued_at=base + timedelta(seconds=random.randint(0, 10 ** 7)))
+        for user_id in range(size)
+    ]
+
+    start = perf_counter()
+    old = comparator_sort(guild, searchers)
+    comparator = perf_counter() - start
+
+    index = QueueIndex()
+    start = perf_counter()
+    index.rebuild(guild, searchers, [])
+    keys = perf_counter() - start
+
+    # pairs the comparator orders differently, ignoring ties within one second and missing members
+    rank = {user_id: position for position, user_id in enumerate(index.searchers)}
+    mismatches = sum(
+        1
+        for x, y in zip(old, old[1:])
+        if rank[x.user_id] > rank[y.user_id]
+        and x.user_id in members
+        and y.user_id in members
+        and int(x.enqueued_at.timestamp()) != int(y.enqueued_at.timestamp())
+    )
+
+    moved = random.sample(list(members.values()), min(MOVES, len(members)))
+    for member in moved:
+        member.status = random.choice(STATUSES)
+    start = perf_counter()
+    for member in moved:
+        index.update_presence(member)
+    move = (perf_counter() - start) / len(moved)
+
+    print(
+        f"{size:>7} members: comparator {comparator * 1000:.1f}ms, keys {keys * 1000:.1f}ms, "
+        f"presence move {move * 1e6:.1f}us, order mismatches {mismatches}"
+    )
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    random.seed(0)
+    for size in sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
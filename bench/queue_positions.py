@@ -0,0 +1,65 @@
+"""
+queue position lookups and updates on the in-memory queue index
+
+    pipenv run python bench/queue_positions.py [sizes...] | tee bench_output.txt
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "clubhouse"))
+
+from queue_index import SortedQueue, ONLINE, MISSING  # noqa: E402
+
+OPERATIONS = 2000
+
+
+def per_op(seconds: float) -> str:
+    return f"{seconds / OPERATIONS * 1e6:.1f}us"
+
+
+def run(size: int):
+    base = datetime(2021, 1, 1)
+    entries = [
+        (user_id, base + timedelta(seconds=random.randint(0, 10 ** 7)), random.randint(ONLINE, MISSING))
+        for user_id in range(size)
+    ]
+    queue = SortedQueue()
+    start = perf_counter()
+    queue.load(entries)
+    load = perf_counter() - start
+
+    sample = random.sample(entries, OPERATIONS)
+
+    start = perf_counter()
+    for user_id, _, _ in sample:
+        queue.position(user_id)
+    position = perf_counter() - start
+
+    start = perf_counter()
+    for user_id, _, _ in sample:
+        queue.discard(user_id)
+    discard = perf_counter() - start
+
+    start = perf_counter()
+    for user_id, timestamp, bucket in sample:
+        queue.put(user_id, timestamp, bucket)
+    put = perf_counter() - start
+
+    print(
+        f"{size:>7} queued: load {load * 1000:.1f}ms, position {per_op(position)}, "
+        f"discard {per_op(discard)}, put {per_op(put)}"
+    )
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    random.seed(0)
+    for size in sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from discord.utils import snowflake_time
+
+from models.channel import Channel
+
+# channel_id, last human message, last message of the bot
+Activity = Tuple[int, Optional[datetime], Optional[datetime]]
+
+
+class ActivityIndex:
+    """
+    last human and last bot message per pairing channel, recorded from on_message
+    the values are persisted in the channel table, changes are collected here and flushed in batches
+    """
+
+    def __init__(self):
+        self._human: Dict[int, Optional[datetime]] = {}
+        self._bot: Dict[int, Optional[datetime]] = {}
+        self._dirty: Set[int] = set()
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._human
+
+    def __len__(self) -> int:
+        return len(self._human)
+
+    def load(self, channels: Iterable[Channel]):
+        self._human.clear()
+        self._bot.clear()
+        self._dirty.clear()
+        for channel in channels:
+            self._human[channel.channel_id] = channel.last_human_message_at
+            self._bot[channel.channel_id] = channel.last_bot_message_at
+
+    def track(self, channel_id: int):
+        self._human.setdefault(channel_id, None)
+        self._bot.setdefault(channel_id, None)
+
+    def open(self, channel_id: int, opened_at: datetime):
+        """
+        start tracking a channel that was just assigned to a pair
+        pooled channels are older than the pairing, so the assignment counts as the last activity instead of the
+        creation of the channel
+        """
+        self._human[channel_id] = opened_at
+        self._bot[channel_id] = None
+        self._dirty.add(channel_id)
+
+    def forget(self, channel_id: int):
+        self._human.pop(channel_id, None)
+        self._bot.pop(channel_id, None)
+        self._dirty.discard(channel_id)
+
+    def retain(self, channel_ids: Iterable[int]):
+        """
+        forget every channel that is not in channel_ids anymore
+        """
+        channel_ids = set(channel_ids)
+        for channel_id in [x for x in self._human if x not in channel_ids]:
+            del self._human[channel_id], self._bot[channel_id]
+            self._dirty.discard(channel_id)
+
+    def record(self, channel_id: int, timestamp: datetime, human: bool):
+        if channel_id not in self._human:
+            return
+        timestamps = self._human if human else self._bot
+        if timestamps[channel_id] is None or timestamps[channel_id] < timestamp:
+            timestamps[channel_id] = timestamp
+            self._dirty.add(channel_id)
+
+    def needs_backfill(self, channel_id: int) -> bool:
+        return channel_id in self._human and self._human[channel_id] is None and self._bot[channel_id] is None
+
+    def last_human(self, channel_id: int) -> datetime:
+        """
+        time of the last human message, the creation of the channel if nobody has written yet
+        """
+        return self._human.get(channel_id) or snowflake_time(channel_id)
+
+    def last_activity(self, channel_id: int) -> datetime:
+        """
+        time of the last human message or message of the bot, whatever was later
+        """
+        return max(self.last_human(channel_id), self._bot.get(channel_id) or snowflake_time(channel_id))
+
+    def mark_dirty(self, channel_ids: Iterable[int]):
+        """
+        flush the channels again, e.g. after a failed write
+        """
+        self._dirty.update(channel_id for channel_id in channel_ids if channel_id in self._human)
+
+    def take_dirty(self) -> List[Activity]:
+        dirty = [(channel_id, self._human[channel_id], self._bot[channel_id]) for channel_id in self._dirty]
+        self._dirty.clear()
+        return dirty
@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+# discord allows at most 50 channels per category
+CATEGORY_CAPACITY = 50
+
+
+class CategorySlots:
+    def __init__(self, channel_ids: Iterable[int] = ()):
+        self.channels: Set[int] = set(channel_ids)
+        # slots handed out whose channel has not been created yet
+        self.reserved = 0
+
+    @property
+    def used(self) -> int:
+        return len(self.channels) + self.reserved
+
+
+class CategoryAllocator:
+    """
+    free channel slots of the pairing categories
+    slots are reserved before a channel is created and confirmed with its id afterwards,
+    channel create/delete events only touch the channel sets, so events and confirmations may arrive in any order
+    """
+
+    def __init__(self, capacity: int = CATEGORY_CAPACITY):
+        self.capacity = capacity
+        self._categories: Dict[int, CategorySlots] = {}
+        # categories with at least one free slot, in the order they were added (dict as ordered set)
+        self._available: Dict[int, None] = {}
+
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self._categories
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    @property
+    def free_slots(self) -> int:
+        return sum(self.capacity - self._categories[category_id].used for category_id in self._available)
+
+    def _update(self, category_id: int):
+        if self._categories[category_id].used < self.capacity:
+            self._available[category_id] = None
+        else:
+            self._available.pop(category_id, None)
+
+    def clear(self):
+        self._categories.clear()
+        self._available.clear()
+
+    def add_category(self, category_id: int, channel_ids: Iterable[int] = ()):
+        self._categories[category_id] = CategorySlots(channel_ids)
+        self._update(category_id)
+
+    def remove_category(self, category_id: int):
+        self._categories.pop(category_id, None)
+        self._available.pop(category_id, None)
+
+    def reserve(self) -> Optional[int]:
+        """
+        reserve a slot in the oldest category that has one, None if all categories are full
+        """
+        category_id = next(iter(self._available), None)
+        if category_id is not None:
+            self._categories[category_id].reserved += 1
+            self._update(category_id)
+        return category_id
+
+    def reserve_in(self, category_id: int) -> bool:
+        """
+        reserve a slot in the given category, False if it is full or unknown
+        """
+        if category_id not in self._available:
+            return False
+        self._categories[category_id].reserved += 1
+        self._update(category_id)
+        return True
+
+    @property
+    def category_ids(self) -> List[int]:
+        return list(self._categories)
+
+    def confirm(self, category_id: int, channel_id: int):
+        if (slots := self._categories.get(category_id)) is None:
+            return
+        slots.reserved = max(0, slots.reserved - 1)
+        slots.channels.add(channel_id)
+        self._update(category_id)
+
+    def cancel(self, category_id: int):
+        if (slots := self._categories.get(category_id)) is None:
+            return
+        slots.reserved = max(0, slots.reserved - 1)
+        self._update(category_id)
+
+    def channel_created(self, category_id: Optional[int], channel_id: int):
+        if (slots := self._categories.get(category_id)) is None:
+            return
+        slots.channels.add(channel_id)
+        self._update(category_id)
+
+    def channel_deleted(self, category_id: Optional[int], channel_id: int):
+        if (slots := self._categories.get(category_id)) is None:
+            return
+        slots.channels.discard(channel_id)
+        self._update(category_id)
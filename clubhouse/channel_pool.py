@@ -0,0 +1,100 @@
+from collections import deque
+from time import monotonic
+from typing import Deque, Dict, Iterable, Optional
+
+from discord import TextChannel
+
+# discord allows two name changes per channel in ten minutes, further renames are rate limited for the rest
+RENAME_LIMIT = 2
+RENAME_WINDOW = 600.0
+
+
+class ChannelPoolMetrics:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.returned = 0
+        self.deleted = 0
+        self.pool_time_total = 0.0
+        self.new_time_total = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    @property
+    def pool_time_avg(self) -> float:
+        return self.pool_time_total / self.hits if self.hits else 0.0
+
+    @property
+    def new_time_avg(self) -> float:
+        return self.new_time_total / self.misses if self.misses else 0.0
+
+
+class ChannelPool:
+    """
+    hidden, pre-created pairing channels, up to `size` per category
+    a channel is handed out by renaming it and setting the overwrites of the pair, closed channels are purged and
+    returned, so only a pool miss has to wait for a new channel
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.metrics = ChannelPoolMetrics()
+        self._pools: Dict[int, Dict[int, TextChannel]] = {}
+        self._renames: Dict[int, Deque[float]] = {}
+
+    def __len__(self) -> int:
+        return sum(map(len, self._pools.values()))
+
+    def __contains__(self, channel_id: int) -> bool:
+        return any(channel_id in pool for pool in self._pools.values())
+
+    def clear(self):
+        self._pools.clear()
+
+    def load(self, category_id: int, channels: Iterable[TextChannel]):
+        self._pools[category_id] = {channel.id: channel for channel in channels}
+
+    def missing(self, category_id: int) -> int:
+        return max(0, self.size - len(self._pools.get(category_id, {})))
+
+    def accepts(self, category_id: Optional[int]) -> bool:
+        return category_id is not None and self.missing(category_id) > 0
+
+    def put(self, channel: TextChannel):
+        self._pools.setdefault(channel.category_id, {})[channel.id] = channel
+
+    def discard(self, channel_id: int):
+        for pool in self._pools.values():
+            pool.pop(channel_id, None)
+        self._renames.pop(channel_id, None)
+
+    def can_rename(self, channel_id: int) -> bool:
+        renames = self._renames.get(channel_id)
+        if renames is None:
+            return True
+        while renames and monotonic() - renames[0] >= RENAME_WINDOW:
+            renames.popleft()
+        return len(renames) < RENAME_LIMIT
+
+    def acquire(self) -> Optional[TextChannel]:
+        """
+        take a pooled channel that can be renamed without running into the rate limit
+        """
+        for pool in self._pools.values():
+            for channel_id, channel in pool.items():
+                if self.can_rename(channel_id):
+                    del pool[channel_id]
+                    self._renames.setdefault(channel_id, deque()).append(monotonic())
+                    return channel
+        return None
+
+    def record(self, hit: bool, seconds: float):
+        if hit:
+            self.metrics.hits += 1
+            self.metrics.pool_time_total += seconds
+        else:
+            self.metrics.misses += 1
+            self.metrics.new_time_total += seconds
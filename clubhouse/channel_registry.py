@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from models.channel import Channel
+
+
+class PairingChannel(NamedTuple):
+    channel_id: int
+    searcher_id: Optional[int]
+    donator_id: Optional[int]
+
+    @staticmethod
+    def of(row: Channel) -> "PairingChannel":
+        return PairingChannel(row.channel_id, row.searcher_id, row.donator_id)
+
+
+class ChannelRegistry:
+    """
+    in-memory copy of the channel table, so commands can look up pairing channels without a query
+    loaded in on_ready, every insert and delete of a channel row has to go through add and remove
+    """
+
+    def __init__(self):
+        self._channels: Dict[int, PairingChannel] = {}
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._channels
+
+    def __iter__(self) -> Iterator[PairingChannel]:
+        return iter(list(self._channels.values()))
+
+    def load(self, rows: Iterable[Channel]):
+        self._channels = {row.channel_id: PairingChannel.of(row) for row in rows}
+
+    def clear(self):
+        self._channels.clear()
+
+    def add(self, channel_id: int, searcher_id: Optional[int], donator_id: Optional[int]) -> PairingChannel:
+        self._channels[channel_id] = entry = PairingChannel(channel_id, searcher_id, donator_id)
+        return entry
+
+    def remove(self, channel_id: int):
+        self._channels.pop(channel_id, None)
+
+    def get(self, channel_id: int) -> Optional[PairingChannel]:
+        return self._channels.get(channel_id)
+
+    def of_user(self, user_id: int) -> List[PairingChannel]:
+        return [entry for entry in self._channels.values() if user_id in (entry.searcher_id, entry.donator_id)]
+
+    def forget_user(self, user_id: int):
+        """
+        mirror the ON DELETE SET NULL of the foreign keys after a searcher or donator row was deleted
+        """
+        for entry in self.of_user(user_id):
+            self._channels[entry.channel_id] = entry._replace(
+                searcher_id=None if entry.searcher_id == user_id else entry.searcher_id,
+                donator_id=None if entry.donator_id == user_id else entry.donator_id,
+            )
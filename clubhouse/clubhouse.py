@@ -1,8 +1,11 @@
 import os
 from datetime import datetime
-from typing import Optional, Iterable
+from pathlib import Path
+from typing import Optional, Tuple
 
 import sentry_sdk
+from alembic import command
+from alembic.config import Config
 from PyDrocsid.database import db
 from PyDrocsid.events import listener, register_cogs
 from PyDrocsid.help import send_help
@@ -46,14 +49,43 @@ if sentry_dsn:
 
 db.create_tables()
 
+# create_tables never alters existing tables, their new columns and indexes come from the migrations
+migrations = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+migrations.set_main_option("script_location", str(Path(__file__).resolve().parent / "migrations"))
+migrations.attributes["configure_logger"] = False
+command.upgrade(migrations, "head")
 
-async def fetch_prefix(_, message: Message) -> Iterable[str]:
-    return await get_prefix(), f"<@!{bot.user.id}> ", f"<@{bot.user.id}> "
+
+# the prefix and both mention forms, rebuilt only when the prefix changes
+prefixes: Tuple[str, ...] = ()
+
+
+async def fetch_prefix(_, message: Message) -> Tuple[str, ...]:
+    global prefixes
+
+    prefix = await get_prefix()
+    if not prefixes or prefixes[0] != prefix:
+        prefixes = prefix, f"<@!{bot.user.id}> ", f"<@{bot.user.id}> "
+    return prefixes
+
+
+class ClubhouseBot(Bot):
+    async def close(self):
+        # let the cogs send buffered messages while the connection is still open
+        for cog in list(self.cogs.values()):
+            if (shutdown := getattr(cog, "shutdown", None)) is not None:
+                try:
+                    await shutdown()
+                except Exception as e:
+                    sentry_sdk.capture_exception(e)
+        await super().close()
 
 
 intents = Intents.all()
 
-bot = Bot(command_prefix=fetch_prefix, case_insensitive=True, description=translations.bot_description, intents=intents)
+bot = ClubhouseBot(
+    command_prefix=fetch_prefix, case_insensitive=True, description=translations.bot_description, intents=intents
+)
 bot.remove_command("help")
 bot.initial = True
 
@@ -236,9 +268,10 @@ async def on_error(*_, **__):
 async def on_command_error(ctx: Context, error: CommandError):
     if ctx.author.bot:
         return
-    if ctx.guild is not None and ctx.prefix == await get_prefix():
-        if isinstance(error, CommandNotFound) and ctx.guild is not None and ctx.prefix == await get_prefix():
-            await ctx.send(f"Use {await get_prefix()}help to get help!")
+    prefix = await get_prefix()
+    if ctx.guild is not None and ctx.prefix == prefix:
+        if isinstance(error, CommandNotFound):
+            await ctx.send(f"Use {prefix}help to get help!")
         else:
             sentry_sdk.capture_exception(error)
             await ctx.send("Critical error, check sentry")
@@ -1,12 +1,12 @@
 import asyncio
-import re
 from asyncio import Lock
 from datetime import datetime, timedelta
-from functools import cmp_to_key
-from os import getenv, remove
+from io import BytesIO
+from os import getenv
 from pathlib import Path
 from re import match
-from typing import Optional, Union, List, Dict, Tuple
+from time import monotonic
+from typing import Optional, Union, List, Dict, Tuple, NamedTuple, Callable, Awaitable
 
 import discord
 import sentry_sdk
@@ -16,27 +16,55 @@ from PyDrocsid.events import StopEventHandling
 from PyDrocsid.translations import translations
 from PyDrocsid.util import send_long_embed
 from discord import Message, Role, PartialEmoji, TextChannel, Member, NotFound, Embed, HTTPException, Forbidden, Guild, \
-    CategoryChannel, PermissionOverwrite, ChannelType, Status, Reaction, File
+    CategoryChannel, PermissionOverwrite, Reaction, File
 from discord.ext import commands, tasks
 from discord.ext.commands import Cog, Bot, guild_only, Context
-from discord.utils import snowflake_time
-from jinja2 import Environment, FileSystemLoader, Markup
-from markdown import Markdown
-from sqlalchemy import or_
+from jinja2 import Environment, FileSystemLoader
+from sqlalchemy import bindparam
 
 from colours import Colours
-from jinja_utils import regex_replace
+from jinja_utils import regex_replace, render_markdown, add_mention_suffix
 from models.category import Category
 from models.channel import Channel
 from models.donator import Donator
+from models.state_event import SEARCHER, DONATOR
 from models.searcher import Searcher
 from models.state import State
-from util import get_prefix
+from models.transition import transition
+from activity_index import ActivityIndex
+from category_allocator import CategoryAllocator
+from channel_pool import ChannelPool
+from channel_registry import ChannelRegistry, PairingChannel
+from dm_dispatcher import DMDispatcher
+from dump_logger import DumpLogger
+from event_store import EventStore, format_event
+from participants import ParticipantIndex
+from permissions import invalidate_permission_level
+from queue_index import QueueIndex
+from reaction_intake import ReactionIntake
+from scheduler import DeadlineScheduler
+from repository import repo
+from util import get_prefix, gather_limited, clear_settings_cache
 
 start_message_link = getenv("MESSAGE_LINK")
 team_role_id = getenv("TEAM_ROLE_ID")
 team_channel_id = getenv("TEAM_CHANNEL_ID")
 bot_dump_chanel_id = getenv("BOT_DUMP_CHANNEL_ID")
+pairing_concurrency = getenv("PAIRING_CONCURRENCY", "5")
+sweep_concurrency = getenv("SWEEP_CONCURRENCY", "4")
+pairing_debounce = getenv("PAIRING_DEBOUNCE_MS", "500")
+dm_workers = getenv("DM_WORKERS", "4")
+# 0: no pacing of our own, discord.py keeps to the route limits and a 429 pauses all dm workers
+dm_per_minute = getenv("DM_PER_MINUTE", "0")
+dm_dedup_ttl = getenv("DM_DEDUP_TTL", "600")
+reaction_workers = getenv("REACTION_WORKERS", "4")
+dump_flush_interval = getenv("DUMP_FLUSH_INTERVAL", "2")
+event_flush_interval = getenv("EVENT_FLUSH_INTERVAL", "2")
+# text: the messages of the cog, events: one line per stored state event, off: nothing
+dump_sink = getenv("DUMP_SINK", "text").lower()
+channel_pool_size = getenv("CHANNEL_POOL_SIZE", "2")
+reaction_queue_size = getenv("REACTION_QUEUE_SIZE", "1000")
+category_spare_slots = getenv("CATEGORY_SPARE_SLOTS", "10")
 
 lst = start_message_link.split("/")
 if not len(lst) == 7 or not lst[-2].isnumeric() or not lst[-1].isnumeric():
@@ -53,15 +81,76 @@ if not team_channel_id.isnumeric():
     exit(1)
 if not bot_dump_chanel_id.isnumeric():
     bot_dump_chanel_id = team_channel_id
+if not pairing_concurrency.isnumeric() or int(pairing_concurrency) < 1:
+    print("PAIRING_CONCURRENCY should be a positive number, using 5")
+    pairing_concurrency = "5"
+if not sweep_concurrency.isnumeric() or int(sweep_concurrency) < 1:
+    print("SWEEP_CONCURRENCY should be a positive number, using 4")
+    sweep_concurrency = "4"
+if not pairing_debounce.isnumeric():
+    print("PAIRING_DEBOUNCE_MS should be a number, using 500")
+    pairing_debounce = "500"
+if not dm_workers.isnumeric() or int(dm_workers) < 1:
+    print("DM_WORKERS should be a positive number, using 4")
+    dm_workers = "4"
+if not dm_per_minute.isnumeric():
+    print("DM_PER_MINUTE should be a number (0 disables the pacing), using 0")
+    dm_per_minute = "0"
+if not dm_dedup_ttl.isnumeric() or int(dm_dedup_ttl) < 1:
+    print("DM_DEDUP_TTL should be a positive number of seconds, using 600")
+    dm_dedup_ttl = "600"
+if not reaction_workers.isnumeric() or int(reaction_workers) < 1:
+    print("REACTION_WORKERS should be a positive number, using 4")
+    reaction_workers = "4"
+if not reaction_queue_size.isnumeric() or int(reaction_queue_size) < 1:
+    print("REACTION_QUEUE_SIZE should be a positive number, using 1000")
+    reaction_queue_size = "1000"
+if not dump_flush_interval.isnumeric() or int(dump_flush_interval) < 1:
+    print("DUMP_FLUSH_INTERVAL should be a positive number of seconds, using 2")
+    dump_flush_interval = "2"
+if not event_flush_interval.isnumeric() or int(event_flush_interval) < 1:
+    print("EVENT_FLUSH_INTERVAL should be a positive number of seconds, using 2")
+    event_flush_interval = "2"
+if dump_sink not in ("text", "events", "off"):
+    print("DUMP_SINK should be one of text, events and off, using text")
+    dump_sink = "text"
+if not channel_pool_size.isnumeric():
+    print("CHANNEL_POOL_SIZE should be a number, using 2")
+    channel_pool_size = "2"
+if not category_spare_slots.isnumeric():
+    print("CATEGORY_SPARE_SLOTS should be a number, using 10")
+    category_spare_slots = "10"
 
 team_channel_id = int(team_channel_id)
 bot_dump_chanel_id = int(bot_dump_chanel_id)
 team_role_id = int(team_role_id)
+pairing_concurrency = int(pairing_concurrency)
+sweep_concurrency = int(sweep_concurrency)
+pairing_debounce = int(pairing_debounce) / 1000
+dm_workers = int(dm_workers)
+dm_per_minute = int(dm_per_minute)
+dm_dedup_ttl = int(dm_dedup_ttl)
+reaction_workers = int(reaction_workers)
+dump_flush_interval = int(dump_flush_interval)
+event_flush_interval = int(event_flush_interval)
+channel_pool_size = int(channel_pool_size)
+reaction_queue_size = int(reaction_queue_size)
+category_spare_slots = int(category_spare_slots)
 
 gift = name_to_emoji["gift"]
 mag = name_to_emoji["mag"]
+GIFT_REMINDER = "gift_reminder"
+CHANNEL_REMINDER = "channel_reminder"
+CHANNEL_EXPIRY = "channel_expiry"
+gift_reminder_interval = timedelta(minutes=5)
+gift_reminder_max_interval = timedelta(hours=24)
+channel_reminder_interval = timedelta(hours=2)
+channel_expiry_interval = timedelta(hours=24)
+expiry_retry_interval = timedelta(minutes=5)
+
 channel_lock = Lock()
-queue_lock = Lock()
+category_lock = Lock()
+pool_lock = Lock()
 needed_permissions = PermissionOverwrite(
     read_messages=True,
     send_messages=True,
@@ -77,35 +166,71 @@ needed_permissions = PermissionOverwrite(
 )
 
 
+class Match(NamedTuple):
+    searcher_id: int
+    donator_id: int
+    used_invites: int
+    donator_was_matched: bool
+
+
+class ReminderMetrics:
+    def __init__(self):
+        self.runs = 0
+        self.sent = 0
+        # not due yet, not waiting anymore, unknown user or the dm could not be sent
+        self.suppressed = 0
+        self.failed = 0
+        self.last_run: Optional[datetime] = None
+
+
 class Clubhouse(Cog, name="Clubhouse"):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.team_channel: Union[TextChannel, None] = None
         self.bot_dump_channel: Union[TextChannel, None] = None
+        self.dump = DumpLogger(dump_flush_interval)
+        self.events = EventStore(event_flush_interval, sink=self.dump_events if dump_sink == "events" else None)
         self.guild: Optional[Guild] = None
         self.team_role: Optional[Role] = None
-        self.task_set: set = set()
+        self.dms = DMDispatcher(
+            dm_workers, dm_per_minute / 60, dm_workers, dm_dedup_ttl, self.report_no_dm, self.report_dm_error
+        )
         self.start_message: Optional[Message] = None
+        self.reactions = ReactionIntake(reaction_workers, reaction_queue_size, self.reaction_worker, (gift, mag))
+        self.queue_index = QueueIndex()
+        self.participants = ParticipantIndex()
+        self.pairing_requested = False
+        self.pairing_task: Optional[asyncio.Task] = None
+        self.activity = ActivityIndex()
+        self.categories = CategoryAllocator()
+        self.channel_registry = ChannelRegistry()
+        self.channel_pool = ChannelPool(channel_pool_size)
+        self.scheduler = DeadlineScheduler()
+        self.reminder_metrics = ReminderMetrics()
+        self.scheduler.register(GIFT_REMINDER, self.remind_donators)
+        self.scheduler.register(CHANNEL_REMINDER, self.remind_channels)
+        self.scheduler.register(CHANNEL_EXPIRY, self.expire_channels)
 
         self.jinja_env = Environment(
             loader=FileSystemLoader(f'{Path(__file__).resolve().parent.parent}/templates')
         )
         self.jinja_env.filters['regexr'] = regex_replace
-        self.jinja_env.filters['markdown'] = lambda text: Markup(Markdown(extensions=['meta']).convert(text))
+        self.jinja_env.filters['markdown'] = render_markdown
         self.template = self.jinja_env.get_template('chatlog.html')
 
-    def add_mention_suffix(self, s):
-        def get_member(_id):
-            member = self.guild.get_member(int(_id))
-            if member:
-                return member.name
-            return "unknown"
+    def mention_suffixer(self) -> Callable[[str], str]:
+        """
+        return an add_mention_suffix function for one chatlog, resolving every mentioned member only once
+        """
+        names: Dict[str, str] = {}
 
-        if isinstance(s, str):
-            y = re.sub(r'<@\!?(\d*?)>', lambda x: f"<@{x.group(1)}> ({get_member(x.group(1))})", s)
-        else:
-            y = ""
-        return y
+        def get_member(_id: str) -> str:
+            if _id not in names:
+                member = self.guild.get_member(int(_id))
+                names[_id] = member.name if member else "unknown"
+            return names[_id]
+
+        return lambda s: add_mention_suffix(s, get_member)
 
     async def on_ready(self):
         self.guild: Optional[Guild] = self.bot.guilds[0]
@@ -116,14 +241,17 @@ class Clubhouse(Cog, name="Clubhouse"):
         self.bot_dump_channel = self.guild.get_channel(bot_dump_chanel_id)
         if self.bot_dump_channel is None:
             self.bot_dump_channel = self.team_channel
+        self.dump.channel = self.bot_dump_channel
+        self.dump.start()
+        self.events.start()
         self.team_role = self.guild.get_role(team_role_id)
         if self.team_role is None:
             print("Unable to find team role")
             exit(1)
 
         categories: List[CategoryChannel] = self.guild.categories
-        db_categories: Dict[int, Category] = {x.category_id: x for x in await db_thread(db.all, Category)}
-        found_categories: List[int] = []
+        db_categories: Dict[int, Category] = {x.category_id: x for x in await repo.categories()}
+        found_categories: List[CategoryChannel] = []
         for category in categories:
             if category.name == "Vermittlung":
                 # if category.overwrites_for(self.guild.me) != needed_permissions:
@@ -134,21 +262,33 @@ class Clubhouse(Cog, name="Clubhouse"):
                 if category.id not in db_categories:
                     await db_thread(Category.create, category_id=category.id)
                     await self.send_to_dump(f"Category <#{category.id}> ({category.id}) added to database")
-                found_categories.append(category.id)
-        for i, category_id in enumerate(list(set(db_categories.keys()).difference(set(found_categories)))):
-            await db_thread(db.delete, db_categories.get(category_id))
+                found_categories.append(category)
+        for category_id in set(db_categories).difference(category.id for category in found_categories):
+            await db_thread(db.delete, db_categories.pop(category_id))
             await self.send_to_dump(f"Kategorie <#{category_id}> ({category_id}) aus der Datenbank gelöscht")
-            del db_categories[i]
+
+        # the free slots are counted once here, afterwards the channel events keep them up to date
+        self.categories.clear()
+        for category in found_categories:
+            self.categories.add_category(category.id, (channel.id for channel in category.channels))
 
         try:
-            if found_categories == 0:
-                category: CategoryChannel = await self.guild.create_category("Vermittlung")
-                await self.send_to_dump(f"Category <#{category.id}> ({category.id}) created and added to database")
-                await db_thread(Category.create, category.id)
+            if not found_categories:
+                await self.add_category()
         except Exception as e:
             sentry_sdk.capture_exception(e)
             print("Could not create category channel")
             exit(1)
+        await self.ensure_spare_category()
+
+        await self.rebuild_queue_index()
+        self.participants.load(await repo.active_users(Searcher) + await repo.active_users(Donator))
+        await self.flush_activity()
+        db_channels: List[Channel] = await repo.all(Channel)
+        self.channel_registry.load(db_channels)
+        self.activity.load(db_channels)
+        self.load_channel_pool()
+        asyncio.create_task(self.fill_channel_pool())
 
         start_channel: Optional[TextChannel] = self.guild.get_channel(start_channel_id)
         if start_channel is None:
@@ -163,24 +303,30 @@ class Clubhouse(Cog, name="Clubhouse"):
         await self.start_message.add_reaction(gift)
         await self.start_message.add_reaction(mag)
 
+        self.dms.start()
+        self.reactions.start()
+        await self.load_deadlines()
+        self.scheduler.start()
         try:
-            self.inactive_loop.start()
-        except RuntimeError:
-            self.inactive_loop.restart()
-        try:
-            self.inactive_channel_deleter_loop.start()
-        except RuntimeError:
-            self.inactive_channel_deleter_loop.restart()
-        try:
-            self.inactive_channel_reminder_loop.start()
-
+            self.activity_flush_loop.start()
         except RuntimeError:
-            self.inactive_channel_reminder_loop.restart()
+            self.activity_flush_loop.restart()
 
     async def send_to_dump(self, text):
-        await self.bot_dump_channel.send(text)
+        # buffered, see DumpLogger
+        if dump_sink == "text":
+            self.dump.log(text)
 
-    async def chatlog(self, channel: TextChannel, reason: str):
+    def dump_events(self, events: List[dict]):
+        for event in events:
+            self.dump.log(format_event(event))
+
+    async def shutdown(self):
+        # the events go first, they may still feed the dump
+        await self.events.close()
+        await self.dump.close()
+
+    def render_message(self, msg: Message, suffix: Callable[[str], str]) -> Dict[str, Union[str, dict, list]]:
         def get_reaction_url(reaction: Reaction) -> str:
             # TODO check if length can be longer than 1
             if isinstance(reaction.emoji, str) and len(reaction.emoji) == 1:
@@ -188,393 +334,744 @@ class Clubhouse(Cog, name="Clubhouse"):
             else:
                 return reaction.emoji.url
 
+        return {
+            "id": msg.id,
+            "bot": msg.author.bot,
+            "attachments": msg.attachments,
+            "embeds": [{
+                "title": suffix(embed.title),
+                "description": suffix(embed.description) if isinstance(embed.description, str) else "",
+                "color": embed.color,
+                "thumbnail": embed.thumbnail if isinstance(embed.thumbnail, str) else "",
+                "fields": [{
+                    "title": suffix(f.name),
+                    "description": suffix(f.value),
+                } for f in embed.fields]
+            } for embed in msg.embeds],
+            "author": {
+                "id": msg.author.id,
+                "name": msg.author.display_name,
+                "avatar": msg.author.avatar_url,
+            },
+            "timestamp": msg.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "content": suffix(msg.content),
+            "reactions": [
+                {
+                    "emoji": reaction.emoji,
+                    "count": reaction.count,
+                    "src": get_reaction_url(reaction)
+                } for reaction in msg.reactions
+            ]
+        }
+
+    def render_chatlog(self, channel_name: str, messages: List[Message]) -> BytesIO:
+        """
+        stream the chatlog template into an in-memory buffer
+        runs in a worker thread, the messages are only converted to template data while the template consumes them
+        """
+        guild: Dict[str, str] = {
+            "name": self.guild.name,
+            "icon": self.guild.icon_url,
+        }
+        suffix = self.mention_suffixer()
+        buffer = BytesIO()
+        for chunk in self.template.generate(
+                guild=guild,
+                channel_name=channel_name,
+                message_count=len(messages),
+                messages=(self.render_message(msg, suffix) for msg in messages),
+        ):
+            buffer.write(chunk.encode())
+        buffer.seek(0)
+        return buffer
+
+    async def chatlog(self, channel: TextChannel, reason: str):
         # create the chatlog report using jinja 2 template and send it to the team channel
-        filename = Path(f'/tmp/{channel.name}.html')
+        # the template needs the message count first, so the history is fetched before rendering starts
+        messages: List[Message] = [msg async for msg in channel.history(limit=2000, oldest_first=True)]
+        buffer: BytesIO = await asyncio.get_running_loop().run_in_executor(
+            None, self.render_chatlog, channel.name, messages
+        )
+        await self.team_channel.send(content=reason, file=File(buffer, filename=f"{channel.name}.html"))
+
+    def record_activity(self, message: Message):
+        # own messages come from on_self_message and backfill_activity
+        if message.author.id == self.bot.user.id:
+            human = False
+        elif message.author.bot:
+            return
+        else:
+            human = True
+        self.activity.record(message.channel.id, message.created_at, human)
+
+    async def backfill_activity(self, channel: TextChannel):
+        """
+        look up the last messages of a channel without recorded activity (e.g. opened before the activity index)
+        """
+        async for msg in channel.history(oldest_first=False, limit=100):
+            self.record_activity(msg)
+        if self.activity.needs_backfill(channel.id):
+            # nothing written yet, the channel counts as active since its creation
+            self.activity.record(channel.id, channel.created_at, False)
+
+    async def flush_activity(self):
+        # channels closed in the meantime are skipped, their rows are already gone
+        changes = [change for change in self.activity.take_dirty() if change[0] in self.channel_registry]
+        if not changes:
+            return
+        # plain updates, unlike bulk_update_mappings a row deleted concurrently is no error
+        statement = Channel.__table__.update().where(Channel.channel_id == bindparam("id")).values(
+            last_human_message_at=bindparam("human"), last_bot_message_at=bindparam("bot")
+        )
         try:
-            guild: Dict[str, str] = {
-                "name": self.guild.name,
-                "icon": self.guild.icon_url,
-            }
-            messages: List[Dict[str, Union[str, dict, list]]] = list()
-            msg: Message
-            async for msg in channel.history(limit=2000, oldest_first=True):
-                messages.append({
-                    "id": msg.id,
-                    "bot": msg.author.bot,
-                    "attachments": msg.attachments,
-                    "embeds": [{
-                        "title": self.add_mention_suffix(embed.title),
-                        "description": self.add_mention_suffix(embed.description) if isinstance(embed.description,
-                                                                                                str) else "",
-                        "color": embed.color,
-                        "thumbnail": embed.thumbnail if isinstance(embed.thumbnail, str) else "",
-                        "fields": [{
-                            "title": self.add_mention_suffix(f.name),
-                            "description": self.add_mention_suffix(f.value),
-                        } for f in embed.fields]
-                    } for embed in msg.embeds],
-                    "author": {
-                        "id": msg.author.id,
-                        "name": msg.author.display_name,
-                        "avatar": msg.author.avatar_url,
-                    },
-                    "timestamp": msg.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    "content": self.add_mention_suffix(msg.content),
-                    "reactions": [
-                        {
-                            "emoji": reaction.emoji,
-                            "count": reaction.count,
-                            "src": get_reaction_url(reaction)
-                        } for reaction in msg.reactions
-                    ]
-                })
-
-            html_content = self.template.render(guild=guild, channel_name=channel.name, messages=messages)
-
-            with filename.open('w') as f:
-                f.write(html_content)
-
-            await self.team_channel.send(content=reason, file=File(str(filename)))
-        finally:
-            remove(filename)
+            await db_thread(lambda: db.session.execute(statement, [
+                {"id": channel_id, "human": human, "bot": bot} for channel_id, human, bot in changes
+            ]))
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+            # the timestamps are still in the index, the next flush writes them
+            self.activity.mark_dirty(channel_id for channel_id, _, _ in changes)
 
-    @tasks.loop(hours=2)
-    async def inactive_channel_reminder_loop(self):
-        # if last message (ignore bot and team messages) was longer than 2 hours ago
-        # send message in channel translations.close_channel_reminder
-        categories: List[Category] = await db_thread(db.all, Category)
-        for category in categories:
-            category_channel: Optional[CategoryChannel] = self.bot.get_channel(category.category_id)
-            if category_channel is None:
+    async def open_pairing_channels(self) -> List[Tuple[TextChannel, PairingChannel]]:
+        """
+        all pairing channels with their database rows, activity is backfilled where missing and flushed
+        categories that do not exist anymore are removed from the database
+        """
+        for category in await repo.categories():
+            if self.bot.get_channel(category.category_id) is None:
+                self.categories.remove_category(category.category_id)
                 await db_thread(db.delete, category)
-                await self.send_to_dump(f"Kategorie <#{category.id}> ({category.id}) aus der Datenbank gelöscht")
+                await self.send_to_dump(f"Kategorie <#{category.category_id}> ({category.category_id})"
+                                        f" aus der Datenbank gelöscht")
+
+        db_channels: List[PairingChannel] = list(self.channel_registry)
+        self.activity.retain(db_channel.channel_id for db_channel in db_channels)
+        channels: List[Tuple[TextChannel, PairingChannel]] = []
+        for db_channel in db_channels:
+            channel: Optional[TextChannel] = self.bot.get_channel(db_channel.channel_id)
+            if channel is None:
                 continue
-            for channel in category_channel.channels:
-                if channel.type != ChannelType.text:
-                    continue
-                channel: TextChannel = channel
-                if datetime.utcnow() < channel.created_at + timedelta(hours=2):
-                    continue
-                async for f in channel.history(oldest_first=False, after=datetime.utcnow() - timedelta(hours=2),
-                                               limit=100):
-                    if f.author.id == self.bot.user.id:
-                        break
-                    if not f.author.bot:
-                        break
-                else:
-                    f = None
-                if f is None or datetime.utcnow() >= snowflake_time(f.id) + timedelta(hours=2):
-                    try:
-                        db_channel: Optional[Channel] = await db_thread(db.get, Channel, channel.id)
-                        if db_channel:
-                            await channel.send(
-                                translations.f_close_channel_reminder(db_channel.donator_id, db_channel.searcher_id))
-                    except Exception as e:
-                        sentry_sdk.capture_exception(e)
+            self.activity.track(channel.id)
+            if self.activity.needs_backfill(channel.id):
+                await self.backfill_activity(channel)
+            channels.append((channel, db_channel))
+        await self.flush_activity()
+        return channels
+
+    @tasks.loop(minutes=1)
+    async def activity_flush_loop(self):
+        await self.flush_activity()
+
+    async def load_deadlines(self):
+        """
+        schedule the deadlines of all open reminders and pairing channels
+        they are derived from persisted state (donator.next_reminder_at and the channel activity), so nothing gets lost
+        """
+        self.scheduler.clear()
+        waiting_donators: List[Tuple[int, datetime]] = await repo.run(
+            lambda session: session.query(Donator.user_id, Donator.next_reminder_at)
+            .filter(Donator.state == State.INITIAL)
+            .filter(Donator.next_reminder_at.isnot(None))
+            .all()
+        )
+        for user_id, next_reminder_at in waiting_donators:
+            self.scheduler.schedule(GIFT_REMINDER, user_id, next_reminder_at)
+        for channel, _ in await self.open_pairing_channels():
+            self.schedule_channel(channel.id)
+
+    def schedule_channel(self, channel_id: int):
+        self.scheduler.schedule(CHANNEL_REMINDER, channel_id, self.channel_reminder_due(channel_id))
+        self.scheduler.schedule(CHANNEL_EXPIRY, channel_id, self.channel_expiry_due(channel_id))
+
+    def channel_reminder_due(self, channel_id: int) -> datetime:
+        # last message (ignore other bots) longer than 2 hours ago
+        return self.activity.last_activity(channel_id) + channel_reminder_interval
+
+    def channel_expiry_due(self, channel_id: int) -> datetime:
+        # last message (ignore bot messages) longer than 24 hours ago
+        return self.activity.last_human(channel_id) + channel_expiry_interval
+
+    def pairing_channels(self, channel_ids: List[int]) -> List[Tuple[TextChannel, PairingChannel]]:
+        db_channels: List[PairingChannel] = list(filter(None, map(self.channel_registry.get, channel_ids)))
+        return [
+            (channel, db_channel)
+            for db_channel in db_channels
+            if (channel := self.bot.get_channel(db_channel.channel_id)) is not None
+        ]
+
+    async def remind_donators(self, donator_ids: List[int]):
+        due, pending = await db_thread(
+            Donator.claim_reminders, donator_ids, datetime.utcnow(), gift_reminder_interval, gift_reminder_max_interval
+        )
+        for donator in due:
+            self.scheduler.schedule(GIFT_REMINDER, donator.user_id, donator.next_reminder_at)
+        for user_id, next_reminder_at in pending:
+            self.scheduler.schedule(GIFT_REMINDER, user_id, next_reminder_at)
+
+        users: List[discord.User] = list(filter(None, (self.bot.get_user(donator.user_id) for donator in due)))
+        results = await gather_limited(
+            (self.send_dm_text(user, translations.gift_reminder) for user in users), sweep_concurrency
+        )
+        sent = sum(result is True for result in results)
+        for result in results:
+            if isinstance(result, Exception):
+                self.reminder_metrics.failed += 1
+                sentry_sdk.capture_exception(result)
+        self.reminder_metrics.runs += 1
+        self.reminder_metrics.sent += sent
+        self.reminder_metrics.suppressed += len(donator_ids) - sent
+        self.reminder_metrics.last_run = datetime.utcnow()
+
+    async def sweep(self, channels: List[Tuple[TextChannel, PairingChannel]],
+                    action: Callable[[TextChannel, PairingChannel], Awaitable]) -> int:
+        """
+        run action for the channels, at most sweep_concurrency of them at the same time
+        requests to the same route (e.g. chatlog uploads to the team channel) are queued by the discord.py rate limiter
+        a failing channel does not affect the others, its exception is reported with the channel id
+        returns the number of failed channels
+        """
+        failed = 0
+        results = await gather_limited((action(channel, db_channel) for channel, db_channel in channels),
+                                       sweep_concurrency)
+        for (channel, _), result in zip(channels, results):
+            if isinstance(result, Exception):
+                failed += 1
+                with sentry_sdk.push_scope() as scope:
+                    scope.set_tag("channel_id", channel.id)
+                    sentry_sdk.capture_exception(result)
+        return failed
+
+    async def remind_channels(self, channel_ids: List[int]):
+        due_channels: List[Tuple[TextChannel, PairingChannel]] = []
+        for channel, db_channel in self.pairing_channels(channel_ids):
+            # activity since the deadline was set moves it back
+            if (due := self.channel_reminder_due(channel.id)) > datetime.utcnow():
+                self.scheduler.schedule(CHANNEL_REMINDER, channel.id, due)
+                continue
+            self.scheduler.schedule(CHANNEL_REMINDER, channel.id, datetime.utcnow() + channel_reminder_interval)
+            due_channels.append((channel, db_channel))
 
-    @tasks.loop(minutes=30)
-    async def inactive_channel_deleter_loop(self):
-        # if last message (ignore bot messages) was longer than 8 hours ago
-        change = False
-        categories: List[Category] = await db_thread(db.all, Category)
-        for category in categories:
-            category_channel: Optional[CategoryChannel] = self.bot.get_channel(category.category_id)
-            if category_channel is None:
-                await db_thread(db.delete, category)
-                await self.send_to_dump(f"Kategorie <#{category.id}> ({category.id}) aus der Datenbank gelöscht")
+        await self.sweep(due_channels, self.remind_channel)
+
+    async def remind_channel(self, channel: TextChannel, db_channel: PairingChannel):
+        await channel.send(translations.f_close_channel_reminder(db_channel.donator_id, db_channel.searcher_id))
+
+    async def expire_channels(self, channel_ids: List[int]):
+        due_channels: List[Tuple[TextChannel, PairingChannel]] = []
+        for channel, db_channel in self.pairing_channels(channel_ids):
+            if (due := self.channel_expiry_due(channel.id)) > datetime.utcnow():
+                self.scheduler.schedule(CHANNEL_EXPIRY, channel.id, due)
                 continue
-            for channel in category_channel.channels:
-                if channel.type != ChannelType.text:
-                    continue
-                channel: TextChannel = channel
-                if datetime.utcnow() < channel.created_at + timedelta(hours=24):
-                    continue
-                async for f in channel.history(oldest_first=False, after=datetime.utcnow() - timedelta(hours=24),
-                                               limit=100):
-                    if not f.author.bot:
-                        break
-                else:
-                    f = None
-                if f is None or datetime.utcnow() >= snowflake_time(f.id) + timedelta(hours=24):
-                    db_channel: Optional[Channel] = await db_thread(db.get, Channel, channel.id)
-                    if db_channel:
-                        searcher: Optional[Searcher] = await db_thread(db.get, Searcher, db_channel.searcher_id)
-                        if searcher:
-                            await self.send_to_dump(f"Suchender <@{searcher.user_id}> ({searcher.user_id})"
-                                                    f" wurde zurück auf QUEUED gesetzt"
-                                                    f" (Channel wg. Inaktivität gelöscht)")
-                            await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED)
-                            if user := self.guild.get_member(db_channel.searcher_id):
-                                await self.send_dm_text(user, translations.channel_timed_out)
-
-                        donator: Optional[Donator] = await db_thread(db.get, Donator, db_channel.donator_id)
-                        if donator:
-                            await self.send_to_dump(
-                                f"Suchender <@{donator.user_id}> ({donator.user_id})"
-                                f" wurde zurück auf MATCHED gesetzt und hat jetzt "
-                                f"{max(0, donator.used_invites - 1)}"
-                                f" Einladungen verbraucht. (Channel wg. Inaktivität gelöscht)")
-                            await db_thread(Donator.change_used_invites, donator.user_id,
-                                            max(0, donator.used_invites - 1))
-                            if user := self.guild.get_member(db_channel.donator_id):
-                                await self.send_dm_text(user, translations.channel_timed_out)
-                        change = True
-                        try:
-                            await self.chatlog(channel, translations.f_chatlog_closed_reason(
-                                donator.user_id, self.guild.get_member(donator.user_id),
-                                searcher.user_id, self.guild.get_member(searcher.user_id),
-                                "Inaktiver Channel für 24 Stunden",
-                            ))
-                            await channel.delete()
-                            await db_thread(db.delete, db_channel)
-                        except Exception as e:
-                            sentry_sdk.capture_exception(e)
-            if change:
-                await self.pair()
+            self.scheduler.cancel(CHANNEL_REMINDER, channel.id)
+            due_channels.append((channel, db_channel))
+        if not due_channels:
+            return
 
-    @tasks.loop(minutes=5)
-    async def inactive_loop(self):
-        donators: List[Donator] = await db_thread(db.all, Donator, state=State.INITIAL)
-        for donator in donators:
-            if datetime.utcnow() >= donator.last_contact + timedelta(minutes=5):
-                await self.send_dm_text(self.bot.get_user(donator.user_id), translations.gift_reminder)
+        if failed := await self.sweep(due_channels, self.expire_channel):
+            await self.send_to_dump(f"{failed} inaktive Channel konnten nicht geschlossen werden, check sentry!")
+        self.request_pairing()
+
+    async def expire_channel(self, channel: TextChannel, db_channel: PairingChannel):
+        def expire() -> Tuple[Optional[Searcher], Optional[Donator]]:
+            # the channel row goes in the same transaction, so an expired channel never requeues its pair twice
+            db.query(Channel).filter_by(channel_id=db_channel.channel_id).delete()
+            return transition(
+                searcher_id=db_channel.searcher_id,
+                searcher_state=State.QUEUED,
+                donator_id=db_channel.donator_id,
+                used_invites_delta=-1,
+            )
 
-    async def remove_from_queue(self, data: tuple, locked: bool = False):
-        if locked:
-            try:
-                self.task_set.remove(data)
-            except:
-                pass
-        else:
-            async with queue_lock:
-                try:
-                    self.task_set.remove(data)
-                except:
-                    pass
+        try:
+            searcher, donator = await db_thread(expire)
+        except Exception:
+            # nothing was changed, the channel has to expire later instead of staying open for good
+            self.scheduler.schedule(CHANNEL_EXPIRY, channel.id, datetime.utcnow() + expiry_retry_interval)
+            raise
+        self.channel_registry.remove(db_channel.channel_id)
+        self.activity.forget(db_channel.channel_id)
+        self.queue_index.sync_searcher(searcher)
+        self.queue_index.sync_donator(donator)
+        self.track_user(searcher, "channel_expired", db_channel.channel_id)
+        self.track_user(donator, "channel_expired", db_channel.channel_id)
 
-    async def put_in_queue(self, data, locked: bool = False):
-        if locked:
-            try:
-                self.task_set.add(data)
-            except:
-                pass
+        try:
+            if searcher:
+                await self.send_to_dump(f"Suchender <@{searcher.user_id}> ({searcher.user_id})"
+                                        f" wurde zurück auf QUEUED gesetzt"
+                                        f" (Channel wg. Inaktivität gelöscht)")
+                if user := self.guild.get_member(searcher.user_id):
+                    await self.send_dm_text(user, translations.channel_timed_out)
+
+            if donator:
+                await self.send_to_dump(
+                    f"Suchender <@{donator.user_id}> ({donator.user_id})"
+                    f" wurde zurück auf MATCHED gesetzt und hat jetzt "
+                    f"{donator.used_invites}"
+                    f" Einladungen verbraucht. (Channel wg. Inaktivität gelöscht)")
+                if user := self.guild.get_member(donator.user_id):
+                    await self.send_dm_text(user, translations.channel_timed_out)
+            # the user rows can be gone (ON DELETE SET NULL), the ids of the registry are used instead
+            await self.chatlog(channel, translations.f_chatlog_closed_reason(
+                db_channel.donator_id, self.guild.get_member(db_channel.donator_id),
+                db_channel.searcher_id, self.guild.get_member(db_channel.searcher_id),
+                "Inaktiver Channel für 24 Stunden",
+            ))
+        finally:
+            await self.release_channel(channel)
+
+    async def delete_db_channel(self, channel_id: int):
+        self.channel_registry.remove(channel_id)
+        self.activity.forget(channel_id)
+        await db_thread(lambda: db.query(Channel).filter_by(channel_id=channel_id).delete())
+
+    async def report_no_dm(self, user: Union[discord.User, discord.Member]):
+        await self.team_channel.send(translations.f_no_dm(user.mention))
+
+    async def report_dm_error(self, _, error: HTTPException):
+        await self.team_channel.send(f"HTTP Error {error.status}! Check sentry!")
+
+    async def send_dm_text(self, user: Union[discord.User, discord.Member], text: str) -> bool:
+        return await self.dms.send(user, text=text)
+
+    async def send_dm_embed(self, user: Union[discord.User, discord.Member], embed: Embed) -> bool:
+        return await self.dms.send(user, embed=embed)
+
+    async def transition(
+        self, reason: str, channel_id: Optional[int] = None, **changes
+    ) -> Tuple[Optional[Searcher], Optional[Donator]]:
+        """
+        apply a state transition in one transaction (see models.transition), keep the queue index in sync and
+        record the state events
+        """
+        searcher, donator = await db_thread(transition, **changes)
+        self.queue_index.sync_searcher(searcher)
+        self.queue_index.sync_donator(donator)
+        self.track_user(searcher, reason, channel_id)
+        self.track_user(donator, reason, channel_id)
+        return searcher, donator
+
+    def track_state(
+        self,
+        model: type,
+        user_id: int,
+        state: Optional[State],
+        reason: str,
+        channel_id: Optional[int] = None,
+        used_invites: Optional[int] = None,
+        invite_count: Optional[int] = None,
+        enqueued_at: Optional[datetime] = None,
+    ):
+        """
+        record a state event and update the participant index, the state None means the row was deleted
+        the previous state comes from the participant index, so it is unknown for users that were done or aborted
+        """
+        previous: Optional[State] = self.participants.state(user_id).get(model)
+        role = DONATOR if model is Donator else SEARCHER
+        self.events.record(role, user_id, previous, state, reason, channel_id, used_invites, invite_count, enqueued_at)
+        if state is None or state in (State.DONE, State.ABORTED):
+            self.participants.discard_user(user_id, model)
         else:
-            async with queue_lock:
-                try:
-                    self.task_set.add(data)
-                except:
-                    pass
+            self.participants.add(model, user_id, state)
 
-    async def search_in_queue(self, data, locked: bool = False):
-        if locked:
-            try:
-                if data in self.task_set:
-                    return True
-                return False
-            except:
-                pass
+    def track_user(self, user: Optional[Union[Searcher, Donator]], reason: str, channel_id: Optional[int] = None):
+        if user is None:
+            return
+        if isinstance(user, Donator):
+            self.track_state(
+                Donator, user.user_id, user.state, reason, channel_id, user.used_invites, user.invite_count
+            )
         else:
-            async with queue_lock:
-                try:
-                    if data in self.task_set:
-                        return True
-                    return False
-                except:
-                    return False
+            self.track_state(Searcher, user.user_id, user.state, reason, channel_id, enqueued_at=user.enqueued_at)
 
-    async def send_dm_text(self, user: Union[discord.User, discord.Member], text: str) -> bool:
-        data = (user.id, text)
-        async with queue_lock:
-            if await self.search_in_queue(data, True):
-                return False
-            await self.put_in_queue(data, True)
-        await asyncio.sleep(0.00001)
-        while True:
+    def track_deleted(self, user: Union[Searcher, Donator], reason: str, channel_id: Optional[int] = None):
+        self.track_state(type(user), user.user_id, None, reason, channel_id)
+
+    async def rebuild_queue_index(self):
+        searching_users: List[Searcher] = await repo.queued_searchers()
+        donating_users: List[Donator] = await repo.queued_donators()
+        self.queue_index.rebuild(self.guild, searching_users, donating_users)
+
+    async def calculate_queues(self) -> Tuple[List[Searcher], List[Donator]]:
+        searcher_ids: List[int] = list(self.queue_index.searchers)
+        donator_ids: List[int] = list(self.queue_index.donators)
+        searchers: Dict[int, Searcher] = await repo.load_users(Searcher, searcher_ids)
+        donators: Dict[int, Donator] = await repo.load_users(Donator, donator_ids)
+
+        return (
+            [searchers[i] for i in searcher_ids if i in searchers],
+            [donators[i] for i in donator_ids if i in donators],
+        )
+
+    def get_queue_position(self, user_id: int, donator: bool = False) -> int:
+        queue = self.queue_index.donators if donator else self.queue_index.searchers
+        return queue.position(user_id) or len(queue)
+
+    def request_pairing(self):
+        """
+        mark the queues as changed without waiting for the pairing
+        all requests within one debounce window are handled by a single pairing pass
+        """
+        self.pairing_requested = True
+        if self.pairing_task is None or self.pairing_task.done():
+            self.pairing_task = asyncio.get_running_loop().create_task(self.pairing_worker())
+
+    async def pairing_worker(self):
+        # requests that arrive during a pass cause exactly one more pass
+        while self.pairing_requested:
+            await asyncio.sleep(pairing_debounce)
+            self.pairing_requested = False
             try:
-                await user.send(text)
-            except Forbidden:
-                await self.remove_from_queue(data)
-                await self.team_channel.send(translations.f_no_dm(user.mention))
-                return False
-            except HTTPException as e:
-                if e.status != 429:
-                    await self.remove_from_queue(data)
-                    await self.team_channel.send(f"HTTP Error {e.status}! Check sentry!")
-                    raise e
+                await self.pair()
             except Exception as e:
-                await self.remove_from_queue(data)
-                raise e
-            else:
-                await self.remove_from_queue(data)
-                return True
-            await asyncio.sleep(5)
+                sentry_sdk.capture_exception(e)
 
-    async def send_dm_embed(self, user: Union[discord.User, discord.Member], embed: Embed) -> bool:
-        data = (user.id, embed.description)
-        async with queue_lock:
-            if await self.search_in_queue(data, True):
-                return False
-            await self.put_in_queue(data, True)
-        await asyncio.sleep(0.00001)
-        while True:
+    async def pair(self):
+        async with channel_lock:
+            matches: List[Match] = await self.plan_matches()
+        for result in await gather_limited(map(self.open_match, matches), pairing_concurrency):
+            if isinstance(result, Exception):
+                sentry_sdk.capture_exception(result)
+
+    async def plan_matches(self) -> List[Match]:
+        """
+        match the queue heads in memory and commit all resulting state changes in one transaction
+        """
+        if not self.queue_index.searchers or not self.queue_index.donators:
+            return []
+
+        donator_ids: List[int] = list(self.queue_index.donators)
+        donators: Dict[int, Donator] = await repo.load_users(Donator, donator_ids)
+        gone_donators: List[int] = []
+        slots: List[int] = []
+        for donator_id in donator_ids:
+            if (donator := donators.get(donator_id)) is None:
+                self.queue_index.discard_donator(donator_id)
+            elif not self.guild.get_member(donator_id):
+                gone_donators.append(donator_id)
+            else:
+                slots += [donator_id] * (donator.invite_count - donator.used_invites)
+
+        gone_searchers: List[int] = []
+        candidates: List[int] = []
+        for searcher_id in self.queue_index.searchers:
+            if len(candidates) >= len(slots):
+                break
+            if self.guild.get_member(searcher_id):
+                candidates.append(searcher_id)
+            else:
+                gone_searchers.append(searcher_id)
+
+        def apply_plan() -> Tuple[List[Match], Dict[int, Donator], List[int], List[int], List[Searcher],
+                                  List[Donator], List[Donator]]:
+            deleted_searchers = [row for row in map(lambda x: db.get(Searcher, x), gone_searchers) if row]
+            for row in deleted_searchers:
+                db.delete(row)
+            aborted_donators, deleted_donators = [], []
+            for row in filter(None, map(lambda x: db.get(Donator, x), gone_donators)):
+                if row.state == State.MATCHED:
+                    row.state = State.ABORTED
+                    aborted_donators.append(row)
+                else:
+                    db.delete(row)
+                    deleted_donators.append(row)
+
+            stale_searchers: List[int] = []
+            stale_donators: List[int] = []
+            planned: List[Match] = []
+            matched_donators: Dict[int, Donator] = {}
+            free_slots = iter(slots)
+
+            def next_donator() -> Optional[Donator]:
+                # the slots were planned before this transaction, the donator may have left, exited or been reset
+                for slot in free_slots:
+                    if slot in stale_donators:
+                        continue
+                    row: Optional[Donator] = db.get(Donator, slot)
+                    if row is not None and row.state in (State.QUEUED, State.MATCHED) \
+                            and row.used_invites < row.invite_count:
+                        return row
+                    stale_donators.append(slot)
+                return None
+
+            for candidate in candidates:
+                searcher: Optional[Searcher] = db.get(Searcher, candidate)
+                if searcher is None or searcher.state != State.QUEUED:
+                    stale_searchers.append(candidate)
+                    continue
+                if (donator := next_donator()) is None:
+                    break
+                was_matched = donator.state == State.MATCHED
+                donator.used_invites += 1
+                donator.state = State.MATCHED
+                searcher.state = State.MATCHED
+                matched_donators[donator.user_id] = donator
+                planned.append(Match(searcher.user_id, donator.user_id, donator.used_invites, was_matched))
+            return (planned, matched_donators, stale_searchers, stale_donators, deleted_searchers, deleted_donators,
+                    aborted_donators)
+
+        matches, matched_donators, stale_searchers, stale_donators, deleted_searchers, deleted_donators, \
+            aborted_donators = await db_thread(apply_plan)
+
+        for row in deleted_searchers + deleted_donators + aborted_donators:
+            self.queue_index.discard(row)
+        for row in deleted_searchers + deleted_donators:
+            self.track_deleted(row, "user_not_found")
+        for row in aborted_donators:
+            self.track_user(row, "user_not_found")
+        for searcher_id in stale_searchers + [match.searcher_id for match in matches]:
+            self.queue_index.discard_searcher(searcher_id)
+        for donator_id in stale_donators:
+            self.queue_index.discard_donator(donator_id)
+        for searcher_id in [match.searcher_id for match in matches]:
+            self.track_state(Searcher, searcher_id, State.MATCHED, "matched")
+        for row in matched_donators.values():
+            self.queue_index.sync_donator(row)
+            self.track_user(row, "matched")
+
+        for row in deleted_searchers:
+            await self.send_to_dump(f"Suchender <@{row.user_id}> ({row.user_id})"
+                                    f" aus der Datenbank gelöscht (als Discord User nicht gefunden)!")
+        for row in aborted_donators:
+            await self.send_to_dump(f"Einladender <@{row.user_id}> ({row.user_id})"
+                                    f" auf ABORTED gesetzt (als Discord User nicht gefunden)")
+        for row in deleted_donators:
+            await self.send_to_dump(f"Einladender <@{row.user_id}> ({row.user_id})"
+                                    f" aus der Datenbank gelöscht (als Discord User nicht gefunden)!")
+        return matches
+
+    async def create_pairing_channel(self, user: Member, donator: Member) -> TextChannel:
+        overwrites = {
+            self.guild.default_role: PermissionOverwrite(read_messages=False, view_channel=False),
+            self.guild.me: needed_permissions,
+            user: PermissionOverwrite(read_messages=True, view_channel=True),
+            donator: PermissionOverwrite(read_messages=True, view_channel=True),
+            self.team_role: PermissionOverwrite(read_messages=True, view_channel=True)
+        }
+
+        started = monotonic()
+        while (channel := self.channel_pool.acquire()) is not None:
             try:
-                await user.send(embed=embed)
-            except Forbidden:
-                await self.remove_from_queue(data)
-                await self.team_channel.send(translations.f_no_dm(user.mention))
-                return False
-            except HTTPException as e:
-                if e.status != 429:
-                    await self.remove_from_queue(data)
-                    await self.team_channel.send(f"HTTP Error {e.status}! Check sentry!")
-                    raise e
+                await channel.edit(name=f"{user.name}", overwrites=overwrites)
+            except NotFound:
+                continue
             except Exception as e:
-                await self.remove_from_queue(data)
-                raise e
-            else:
-                await self.remove_from_queue(data)
-                return True
-            await asyncio.sleep(5)
+                # the channel is out of the pool already, delete it instead of leaving a hidden orphan behind
+                sentry_sdk.capture_exception(e)
+                try:
+                    await channel.delete()
+                except HTTPException as e:
+                    sentry_sdk.capture_exception(e)
+                else:
+                    self.channel_pool.metrics.deleted += 1
+                break
+            self.channel_pool.record(True, monotonic() - started)
+            asyncio.create_task(self.fill_channel_pool())
+            return channel
 
-    async def calculate_queues(self) -> Tuple[List[Searcher], List[Donator]]:
-        def sort_users(x: Union[Donator, Searcher, None] = None, y: Union[Donator, Searcher, None] = None) -> int:
-            if x is None:
-                return 1
-            if y is None:
-                return -1
-            user_x: Optional[discord.Member] = self.guild.get_member(x.user_id)
-            if user_x is None:
-                return 1
-            user_y: Optional[discord.Member] = self.guild.get_member(y.user_id)
-            if user_y is None:
-                return -1
-            if user_x.status == Status.offline and user_y.status == Status.offline or \
-                user_x.status != Status.offline and user_y.status != Status.offline:
-                if user_x.status == Status.online and user_y.status != Status.online:
-                    return -1
-                elif user_x.status != Status.online and user_y.status == Status.online:
-                    return 1
-                if isinstance(x, Donator) and isinstance(y, Donator):
-                    return int(x.last_contact.timestamp() - y.last_contact.timestamp())
-                elif isinstance(x, Searcher) and isinstance(y, Searcher):
-                    return int(x.enqueued_at.timestamp() - y.enqueued_at.timestamp())
-            elif user_x.status == Status.offline and user_y.status != Status.offline:
-                return 1
-            elif user_x.status != Status.offline and user_y.status == Status.offline:
-                return -1
-
-        donating_users: List[Donator] = await db_thread(
-            lambda: db.query(Donator)
-                .filter(Donator.used_invites < Donator.invite_count)
-                .filter(Donator.state.in_((State.MATCHED, State.QUEUED)))
-                .all())
+        channel = await self.new_category_channel(f"{user.name}", overwrites)
+        self.channel_pool.record(False, monotonic() - started)
+        return channel
 
-        searching_users: List[Searcher] = await db_thread(
-            lambda: db.query(Searcher).filter_by(state=State.QUEUED).all())
+    async def new_category_channel(self, name: str, overwrites: Dict, category_id: Optional[int] = None) -> TextChannel:
+        """
+        create a text channel in a pairing category with a free slot
+        with a category_id, the slot in that category has to be reserved already
+        """
+        while category_id is None:
+            async with category_lock:
+                if (category_id := self.categories.reserve()) is None:
+                    await self.add_category()
+                    continue
+            if self.bot.get_channel(category_id) is not None:
+                break
+            self.categories.remove_category(category_id)
+            await db_thread(lambda: db.query(Category).filter_by(category_id=category_id).delete())
+            await self.send_to_dump(f"Kategorie <#{category_id}> ({category_id}) aus der Datenbank gelöscht")
+            category_id = None
 
-        if donating_users:
-            donating_users.sort(key=cmp_to_key(sort_users))
-        if searching_users:
-            searching_users.sort(key=cmp_to_key(sort_users))
+        category_channel: CategoryChannel = self.bot.get_channel(category_id)
+        try:
+            channel: TextChannel = await category_channel.create_text_channel(name, overwrites=overwrites)
+        except BaseException:
+            self.categories.cancel(category_id)
+            raise
+        self.categories.confirm(category_id, channel.id)
+
+        if self.categories.free_slots < category_spare_slots:
+            asyncio.create_task(self.ensure_spare_category())
+        return channel
+
+    def pool_overwrites(self) -> Dict:
+        return {
+            self.guild.default_role: PermissionOverwrite(read_messages=False, view_channel=False),
+            self.guild.me: needed_permissions,
+        }
+
+    def load_channel_pool(self):
+        """
+        pooled channels are the channels of the pairing categories without a pairing and without member overwrites
+        """
+        self.channel_pool.clear()
+        for category_id in self.categories.category_ids:
+            if (category := self.bot.get_channel(category_id)) is None:
+                continue
+            self.channel_pool.load(category_id, [
+                channel for channel in category.text_channels
+                if channel.id not in self.channel_registry
+                and not any(isinstance(target, Member) for target in channel.overwrites)
+            ][:channel_pool_size])
 
-        return searching_users, donating_users
+    async def fill_channel_pool(self):
+        """
+        create pooled channels until every category has CHANNEL_POOL_SIZE of them or is full
+        """
+        async with pool_lock:
+            for category_id in self.categories.category_ids:
+                for _ in range(self.channel_pool.missing(category_id)):
+                    if not self.categories.reserve_in(category_id):
+                        break
+                    try:
+                        channel = await self.new_category_channel("frei", self.pool_overwrites(), category_id)
+                    except Exception as e:
+                        sentry_sdk.capture_exception(e)
+                        return
+                    self.channel_pool.put(channel)
 
-    async def pair(self):
-        async with channel_lock:
-            searching_users, donating_users = await self.calculate_queues()
-            if not donating_users:
-                return
-            if not searching_users:
-                return
+    async def release_channel(self, channel: TextChannel):
+        """
+        purge a closed pairing channel and put it back into the pool, delete it if the pool is full
+        channels with messages older than 14 days are deleted as well, discord only bulk deletes newer messages
+        """
+        self.activity.forget(channel.id)
+        self.scheduler.cancel(CHANNEL_REMINDER, channel.id)
+        self.scheduler.cancel(CHANNEL_EXPIRY, channel.id)
+        if channel.category_id in self.categories and self.channel_pool.accepts(channel.category_id):
+            before = datetime.utcnow() - timedelta(days=14)
+            if not [msg async for msg in channel.history(limit=1, before=before)]:
+                try:
+                    await channel.purge(limit=None)
+                    await channel.edit(overwrites=self.pool_overwrites())
+                except NotFound:
+                    return
+                except (Forbidden, HTTPException) as e:
+                    sentry_sdk.capture_exception(e)
+                else:
+                    self.channel_pool.put(channel)
+                    self.channel_pool.metrics.returned += 1
+                    return
+        await channel.delete()
+        self.channel_pool.metrics.deleted += 1
 
-            for db_searcher in searching_users:
-                user: Optional[discord.Member] = self.guild.get_member(db_searcher.user_id)
-                if not user:
-                    await db_thread(db.delete, db_searcher)
-                    await self.send_to_dump(f"Suchender <@{db_searcher.user_id}> ({db_searcher.user_id})"
-                                            f" aus der Datenbank gelöscht (als Discord User nicht gefunden)!")
-                    continue
-                while len(donating_users) > 0:
-                    db_donator = donating_users[0]
-                    donator: Optional[discord.Member] = self.guild.get_member(db_donator.user_id)
-                    if not donator:
-                        if db_donator.state == State.MATCHED:
-                            await db_thread(Donator.change_state, db_donator.user_id, State.ABORTED)
-                            await self.send_to_dump(f"Einladender <@{db_donator.user_id}> ({db_donator.user_id})"
-                                                    f" auf ABORTED gesetzt (als Discord User nicht gefunden)")
-                        else:
-                            await db_thread(db.delete, db_donator)
-                            await self.send_to_dump(f"Einladender <@{db_donator.user_id}> ({db_donator.user_id})"
-                                                    f" aus der Datenbank gelöscht (als Discord User nicht gefunden)!")
-                        del donating_users[0]
-                        continue
+    async def add_category(self) -> CategoryChannel:
+        category: CategoryChannel = await self.guild.create_category("Vermittlung")
+        await db_thread(Category.create, category.id)
+        self.categories.add_category(category.id)
+        await self.send_to_dump(f"Category <#{category.id}> ({category.id}) created and added to database")
+        return category
 
-                    overwrites = {
-                        self.guild.default_role: PermissionOverwrite(read_messages=False, view_channel=False),
-                        self.guild.me: needed_permissions,
-                        user: PermissionOverwrite(read_messages=True, view_channel=True),
-                        donator: PermissionOverwrite(read_messages=True, view_channel=True),
-                        self.team_role: PermissionOverwrite(read_messages=True, view_channel=True)
-                    }
-
-                    categories: List[Category] = await db_thread(db.all, Category)
-                    for category in categories:
-                        category_channel: Optional[CategoryChannel] = self.bot.get_channel(category.category_id)
-                        if category_channel is None:
-                            await db_thread(db.delete, category)
-                            await self.send_to_dump(f"Kategorie <#{category.id}> ({category.id})"
-                                                    f" aus der Datenbank gelöscht")
-                            continue
-                        if len(category_channel.channels) < 50:
-                            new_channel: TextChannel = await category_channel.create_text_channel(f"{user.name}",
-                                                                                                  overwrites=overwrites)
-                            break
-                    else:
-                        category: CategoryChannel = await self.guild.create_category("Vermittlung")
-                        new_channel: TextChannel = await category.create_text_channel(f"{user.name}",
-                                                                                      overwrites=overwrites)
-                        await db_thread(Category.create, category.id)
-
-                    await db_thread(Channel.create, channel_id=new_channel.id, donator_id=donator.id,
-                                    searcher_id=user.id)
-                    await new_channel.send(translations.f_ping_users(user.mention, donator.mention))
-                    tutorial_embed = Embed(
-                        title=translations.tutorial_embed_title,
-                        description=translations.f_tutorial_embed_description(
-                            user.mention, donator.mention, colour=Colours.blue)
-                    )
-                    await new_channel.send(embed=tutorial_embed)
-
-                    await self.team_channel.send(
-                        translations.f_paired_users(donator.mention, user.mention, new_channel.mention))
-                    await self.send_dm_text(user, translations.f_channel_created(donator.mention, new_channel.mention))
-                    await self.send_dm_text(donator, translations.f_channel_created(user.mention, new_channel.mention))
-
-                    if db_donator.invite_count <= db_donator.used_invites + 1:
-                        del donating_users[0]
-                    await db_thread(db_donator.change_used_invites, db_donator.user_id, db_donator.used_invites + 1)
-                    await self.send_to_dump(
-                        f"Einladender <@{donator.id}> ({donator.id})"
-                        f" hat jetzt  {max(0, db_donator.used_invites - 1)}"
-                        f" Einladungen verbraucht. (Vermittelt)")
-                    db_donator.used_invites += 1
-                    if db_donator.state != State.MATCHED:
-                        await db_thread(Donator.change_state, donator.id, State.MATCHED)
-                        await self.send_to_dump(f"Einladender <@{donator.id}> ({donator.id}) auf MATCHED gesetzt")
-                    if db_searcher.state != State.MATCHED:
-                        await db_thread(Searcher.change_state, user.id, State.MATCHED)
-                        await self.send_to_dump(f"Suchender <@{user.id}> ({user.id}) auf MATCHED gesetzt")
-                    break
+    async def ensure_spare_category(self):
+        """
+        create a new category in advance once the free slots of all categories drop below CATEGORY_SPARE_SLOTS
+        """
+        try:
+            async with category_lock:
+                if self.categories.free_slots < category_spare_slots:
+                    await self.add_category()
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    @Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        self.categories.channel_created(channel.category_id, channel.id)
+
+    @Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        if before.category_id != after.category_id:
+            self.categories.channel_deleted(before.category_id, before.id)
+            self.categories.channel_created(after.category_id, after.id)
+
+    @Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.channel_pool.discard(channel.id)
+        if channel.id in self.categories:
+            self.categories.remove_category(channel.id)
+        else:
+            self.categories.channel_deleted(channel.category_id, channel.id)
+
+    async def revert_match(self, match: Match):
+        def revert() -> Tuple[Optional[Searcher], Optional[Donator]]:
+            searcher: Optional[Searcher] = db.get(Searcher, match.searcher_id)
+            if searcher and searcher.state == State.MATCHED:
+                searcher.state = State.QUEUED
+            donator: Optional[Donator] = db.get(Donator, match.donator_id)
+            if donator:
+                donator.used_invites = max(0, donator.used_invites - 1)
+                if not match.donator_was_matched and donator.state == State.MATCHED:
+                    donator.state = State.QUEUED
+            return searcher, donator
+
+        searcher, donator = await db_thread(revert)
+        self.queue_index.sync_searcher(searcher)
+        self.queue_index.sync_donator(donator)
+        self.track_user(searcher, "channel_failed")
+        self.track_user(donator, "channel_failed")
+        await self.send_to_dump(f"Vermittlung von <@{match.searcher_id}> ({match.searcher_id}) und"
+                                f" <@{match.donator_id}> ({match.donator_id}) rückgängig gemacht"
+                                f" (Channel konnte nicht erstellt werden)")
+
+    async def open_match(self, match: Match):
+        user: Optional[Member] = self.guild.get_member(match.searcher_id)
+        donator: Optional[Member] = self.guild.get_member(match.donator_id)
+        if user is None or donator is None:
+            await self.revert_match(match)
+            return
+        try:
+            new_channel: TextChannel = await self.create_pairing_channel(user, donator)
+        except (Forbidden, HTTPException):
+            await self.revert_match(match)
+            raise
+
+        await db_thread(Channel.create, channel_id=new_channel.id, donator_id=donator.id, searcher_id=user.id)
+        self.channel_registry.add(new_channel.id, searcher_id=user.id, donator_id=donator.id)
+        self.track_state(Searcher, user.id, State.MATCHED, "channel_opened", new_channel.id)
+        self.track_state(Donator, donator.id, State.MATCHED, "channel_opened", new_channel.id, match.used_invites)
+        # after the row exists, so the activity flush can persist the start of the pairing
+        self.activity.open(new_channel.id, datetime.utcnow())
+        self.schedule_channel(new_channel.id)
+        await new_channel.send(translations.f_ping_users(user.mention, donator.mention))
+        tutorial_embed = Embed(
+            title=translations.tutorial_embed_title,
+            description=translations.f_tutorial_embed_description(
+                user.mention, donator.mention, colour=Colours.blue)
+        )
+        await new_channel.send(embed=tutorial_embed)
+
+        await asyncio.gather(
+            self.team_channel.send(translations.f_paired_users(donator.mention, user.mention, new_channel.mention)),
+            self.send_dm_text(user, translations.f_channel_created(donator.mention, new_channel.mention)),
+            self.send_dm_text(donator, translations.f_channel_created(user.mention, new_channel.mention)),
+        )
+
+        await self.send_to_dump(f"Einladender <@{donator.id}> ({donator.id})"
+                                f" hat jetzt  {match.used_invites}"
+                                f" Einladungen verbraucht. (Vermittelt)")
+        if not match.donator_was_matched:
+            await self.send_to_dump(f"Einladender <@{donator.id}> ({donator.id}) auf MATCHED gesetzt")
+        await self.send_to_dump(f"Suchender <@{user.id}> ({user.id}) auf MATCHED gesetzt")
 
     async def on_member_remove(self, member: Member):
+        invalidate_permission_level(member.id)
         if member.bot:
             return
-        for user in [await db_thread(db.get, Donator, member.id), await db_thread(db.get, Searcher, member.id)]:
+        for user in await repo.get_user(member.id):
             if not user:
                 continue
 
             if user.state in [State.INITIAL, State.QUEUED]:
                 await db_thread(db.delete, user)
+                self.queue_index.discard(user)
+                self.track_deleted(user, "member_left")
                 name = "Einladender" if isinstance(user, Donator) else "Suchender"
                 await self.send_to_dump(f"{name} <@{member.id}> ({member.id}) aus der Datenbank gelöscht "
                                         f"(hat den Server verlassen)!")
@@ -584,33 +1081,32 @@ class Clubhouse(Cog, name="Clubhouse"):
                 continue
 
             db_channel = None
-            for db_channel in await db_thread(lambda: db.query(Channel).filter(or_(
-                    member.id == Channel.donator_id,
-                    member.id == Channel.searcher_id
-            )).all()):
-                donator = await db_thread(db.get, Donator, db_channel.donator_id)
+            for db_channel in self.channel_registry.of_user(member.id):
+                searcher, donator = await self.transition(
+                    "member_left",
+                    db_channel.channel_id,
+                    donator_id=db_channel.donator_id,
+                    donator_state=State.ABORTED if member.id == db_channel.donator_id else None,
+                    used_invites_delta=-1,
+                    searcher_id=db_channel.searcher_id,
+                    searcher_state=State.ABORTED if member.id == db_channel.searcher_id else State.QUEUED,
+                )
                 other_id = 0
                 if donator:
                     if member.id == donator.user_id:
-                        await db_thread(Donator.change_state, member.id, State.ABORTED)
                         await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id})"
                                                 f" auf ABORTED gesetzt (hat den Server verlassen)")
                     else:
                         other_id = donator.user_id
-                    await db_thread(Donator.change_used_invites, donator.user_id,
-                                    max(0, donator.used_invites - 1))
                     await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id}) hat nun"
-                                            f" {max(0, donator.used_invites - 1)} verbrauchte Einladungen"
+                                            f" {donator.used_invites} verbrauchte Einladungen"
                                             f" (Suchender hat den Server verlassen)")
-                searcher = await db_thread(db.get, Searcher, db_channel.searcher_id)
                 if searcher:
                     if member.id == searcher.user_id:
-                        await db_thread(Searcher.change_state, searcher.user_id, State.ABORTED)
                         await self.send_to_dump(
                             f"Einladender <@{searcher.user_id}> ({searcher.user_id}) auf ABORTED gesetzt"
                             f" (hat den Server verlassen)")
                     else:
-                        await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED)
                         await self.send_to_dump(f"Suchender <@{searcher.user_id}> ({searcher.user_id})"
                                                 f" auf QUEUED gesetzt (Einladender hat den Server verlassen)")
                         other_id = searcher.user_id
@@ -618,7 +1114,7 @@ class Clubhouse(Cog, name="Clubhouse"):
                     await self.send_dm_text(other_user, translations.f_other_used_quitted(member.mention))
 
                 channel: Optional[TextChannel] = self.bot.get_channel(db_channel.channel_id)
-                await db_thread(db.delete, db_channel)
+                await self.delete_db_channel(db_channel.channel_id)
                 try:
                     if channel:
                         await self.chatlog(channel, translations.f_chatlog_closed_reason(
@@ -626,41 +1122,46 @@ class Clubhouse(Cog, name="Clubhouse"):
                             searcher.user_id, self.guild.get_member(searcher.user_id),
                             f"<@{member.id}> hat den Server gerade verlassen!",
                         ))
-                        await channel.delete()
+                        await self.release_channel(channel)
                 except Exception as e:
                     sentry_sdk.capture_exception(e)
             if db_channel:
-                await self.pair()
+                self.request_pairing()
+
+    @Cog.listener()
+    async def on_member_update(self, before: Member, after: Member):
+        # a discord.py listener, PyDrocsid only forwards nick and role changes
+        if before.status != after.status:
+            self.queue_index.update_presence(after)
+        if before.roles != after.roles:
+            invalidate_permission_level(after.id)
 
     async def on_raw_reaction_add(self, message: Message, emoji: PartialEmoji, member: Member):
         if member.bot or message.guild is None:
             return
         if message.id != start_message_id:
             return
-        await message.remove_reaction(emoji, member)
-        asyncio.get_running_loop().create_task(self.reaction_worker(message, emoji, member))
+        emoji = str(emoji)
+        self.reactions.remove_later(message, emoji, member)
+        if emoji in (gift, mag):
+            self.reactions.submit(member, emoji)
         raise StopEventHandling
 
     async def gift_reaction(self, member: Member):
-        user: Optional[Searcher] = await db_thread(db.get, Searcher, member.id)
+        donator, user = await repo.get_user(member.id)
         ret = True
         if user and not State.completed(user):
             if user.state == State.INITIAL:
                 await self.send_dm_text(member, translations.read_again)
             elif user.state == State.QUEUED:
-                searching_user, _ = await self.calculate_queues()
-                index = 0
-                for searcher in searching_user:
-                    index += 1
-                    if searcher.user_id == member.id:
-                        break
-                await self.send_dm_text(member, translations.f_self_still_in_queue(index))
+                await self.send_dm_text(member, translations.f_self_still_in_queue(
+                    self.get_queue_position(member.id)))
             elif user.state == State.MATCHED:
                 ret = False
                 await self.send_dm_text(member, translations.invite_mode)
             if ret:
                 return
-        user = await db_thread(db.get, Donator, member.id)
+        user = donator
         if user:
             if user.state == State.INITIAL:
                 await self.send_dm_text(member, translations.gift_reminder)
@@ -678,28 +1179,25 @@ class Clubhouse(Cog, name="Clubhouse"):
         )
         if not await self.send_dm_embed(member, embed=embed):
             return
-        await db_thread(Donator.create, member.id)
+        next_reminder_at: datetime = datetime.utcnow() + gift_reminder_interval
+        self.track_user(await db_thread(Donator.create, member.id, next_reminder_at=next_reminder_at), "gift_reaction")
+        self.scheduler.schedule(GIFT_REMINDER, member.id, next_reminder_at)
 
     async def search_reaction(self, member: Member):
-        user = await db_thread(db.get, Donator, member.id)
+        user, searcher = await repo.get_user(member.id)
         if user:
             if user.state == State.INITIAL:
                 await self.send_dm_text(member, translations.invite_mode)
             else:
                 await self.send_dm_text(member, translations.already_invited)
             return
-        user = await db_thread(db.get, Searcher, member.id)
+        user = searcher
         if user and not State.completed(user):
             if user.state == State.INITIAL:
                 await self.send_dm_text(member, translations.read_again)
             elif user.state == State.QUEUED:
-                searching_users, _ = await self.calculate_queues()
-                index = 0
-                for searcher in searching_users:
-                    index += 1
-                    if searcher.user_id == member.id:
-                        break
-                await self.send_dm_text(member, translations.f_self_still_in_queue(index))
+                await self.send_dm_text(member, translations.f_self_still_in_queue(
+                    self.get_queue_position(member.id)))
             elif user.state == State.MATCHED:
                 await self.send_dm_text(member, translations.already_in_room)
             return
@@ -716,24 +1214,34 @@ class Clubhouse(Cog, name="Clubhouse"):
         if not await self.send_dm_embed(member, embed=embed):
             return
         if not user:
-            await db_thread(Searcher.create, member.id)
+            self.track_user(await db_thread(Searcher.create, member.id), "search_reaction")
 
-    async def reaction_worker(self, message: Message, emoji: PartialEmoji, member: Member):
-        emoji = str(emoji)
+    async def reaction_worker(self, member: Member, emoji: str):
         if emoji == gift:
             await self.gift_reaction(member)
 
         elif emoji == mag:
             await self.search_reaction(member)
 
+    async def on_self_message(self, message: Message):
+        # PyDrocsid hands the messages of the bot to this handler instead of on_message
+        self.record_activity(message)
+
     async def on_message(self, message: Message):
-        if message.content.startswith(await get_prefix()):
-            return
+        self.record_activity(message)
         if message.author.bot:
             return
-        user: Union[Donator, Searcher] = await db_thread(db.get, Donator, message.author.id)
+        # only `exit` in a guild channel and dms change the state of a user, and only of users in the process
+        if message.guild is not None and message.content.lower() != "exit":
+            return
+        if message.author.id not in self.participants:
+            return
+        if message.content.startswith(await get_prefix()):
+            return
+        donator, searcher = await repo.get_user(message.author.id)
+        user: Union[Donator, Searcher] = donator
         if not user or State.completed(user):
-            user = await db_thread(db.get, Searcher, message.author.id)
+            user = searcher
         if user is None or State.completed(user):
             return
 
@@ -745,6 +1253,8 @@ class Clubhouse(Cog, name="Clubhouse"):
                 await self.send_dm_text(message.author, translations.queue_left)
             if user.state in [State.INITIAL, State.QUEUED]:
                 await db_thread(db.delete, user)
+                self.queue_index.discard(user)
+                self.track_deleted(user, "exit")
                 name = "Einladender" if isinstance(user, Donator) else "Suchender"
                 await self.send_to_dump(f"{name} <@{user.user_id}> ({user.user_id}) aus der Datenbank gelöscht "
                                         f"(hat `exit` eingegeben)!")
@@ -754,34 +1264,33 @@ class Clubhouse(Cog, name="Clubhouse"):
                 return
 
             db_channel = None
-            for db_channel in await db_thread(lambda: db.query(Channel).filter(or_(
-                    message.author.id == Channel.donator_id,
-                    message.author.id == Channel.searcher_id
-            )).all()):
-                donator = await db_thread(db.get, Donator, db_channel.donator_id)
+            for db_channel in self.channel_registry.of_user(message.author.id):
+                searcher, donator = await self.transition(
+                    "exit",
+                    db_channel.channel_id,
+                    donator_id=db_channel.donator_id,
+                    donator_state=State.ABORTED if message.author.id == db_channel.donator_id else None,
+                    used_invites_delta=-1,
+                    searcher_id=db_channel.searcher_id,
+                    searcher_state=State.ABORTED if message.author.id == db_channel.searcher_id else State.QUEUED,
+                )
                 other_id = 0
                 if donator:
                     if message.author.id == donator.user_id:
                         await self.send_to_dump(
                             f"Einladender <@{donator.user_id}> ({donator.user_id}) auf ABORTED gesetzt"
                             f" (hat `exit` eingegeben)!")
-                        await db_thread(Donator.change_state, message.author.id, State.ABORTED)
                     else:
                         other_id = donator.user_id
                     await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id}) hat jetzt"
-                                            f" {max(0, donator.used_invites - 1)} verbrauchte Einladungen"
+                                            f" {donator.used_invites} verbrauchte Einladungen"
                                             f" (Suchender hat `exit` eingegeben)!")
-                    await db_thread(Donator.change_used_invites, donator.user_id,
-                                    max(0, donator.used_invites - 1))
-                searcher = await db_thread(db.get, Searcher, db_channel.searcher_id)
                 if searcher:
                     if message.author.id == searcher.user_id:
-                        await db_thread(Searcher.change_state, searcher.user_id, State.ABORTED)
                         await self.send_to_dump(
                             f"Suchender <@{searcher.user_id}> ({searcher.user_id}) auf ABORTED gesetzt"
                             f" (hat `exit` eingegeben)!")
                     else:
-                        await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED)
                         await self.send_to_dump(
                             f"Suchender <@{searcher.user_id}> ({searcher.user_id}) auf QUEUED gesetzt"
                             f" (Einladender hat `exit` eingegeben)!")
@@ -790,7 +1299,7 @@ class Clubhouse(Cog, name="Clubhouse"):
                     await self.send_dm_text(other_user, translations.f_other_used_quitted(message.author.mention))
 
                 channel: Optional[TextChannel] = self.bot.get_channel(db_channel.channel_id)
-                await db_thread(db.delete, db_channel)
+                await self.delete_db_channel(db_channel.channel_id)
                 try:
                     if channel:
                         await self.chatlog(channel, translations.f_chatlog_closed_reason(
@@ -798,11 +1307,11 @@ class Clubhouse(Cog, name="Clubhouse"):
                             searcher.user_id, self.guild.get_member(searcher.user_id),
                             f"{message.author.mention} hat exit eingegeben",
                         ))
-                        await channel.delete()
+                        await self.release_channel(channel)
                 except Exception as e:
                     sentry_sdk.capture_exception(e)
             if db_channel:
-                await self.pair()
+                self.request_pairing()
             return
 
         if message.guild is None:
@@ -813,22 +1322,28 @@ class Clubhouse(Cog, name="Clubhouse"):
                     return
                 await self.send_to_dump(f"Einladender <@{user.user_id}> ({user.user_id}) hat jetzt"
                                         f" 0 verbrauchte Einladungen and wurde auf QUEUED gesetzt")
-                await db_thread(lambda:
-                                (Donator.change_state(user.user_id, State.QUEUED),
-                                 Donator.change_invite_count(user.user_id, int(matcher.groups()[0])))
-                                )
+                await self.transition(
+                    "invite_count",
+                    donator_id=user.user_id,
+                    donator_state=State.QUEUED,
+                    invite_count=int(matcher.groups()[0]),
+                )
                 await self.send_dm_text(message.author, translations.gift_ready)
-                await self.pair()
+                self.request_pairing()
 
             else:
                 if user.state == State.INITIAL:
                     if message.content.lower() == "apple":
                         await self.send_to_dump(f"Suchender <@{user.user_id}> ({user.user_id}) auf QUEUED gesetzt"
                                                 f" (hat `apple` eingegeben)!")
-                        await db_thread(Searcher.change_state, user.user_id, State.QUEUED)
-                        await db_thread(Searcher.change_timestamp, user.user_id, datetime.utcnow())
+                        await self.transition(
+                            "apple",
+                            searcher_id=user.user_id,
+                            searcher_state=State.QUEUED,
+                            enqueued_at=datetime.utcnow(),
+                        )
                         await self.send_dm_text(message.author, translations.mag_added_queue)
-                        await self.pair()
+                        self.request_pairing()
                     else:
                         await self.send_dm_text(message.author, translations.read_again)
 
@@ -845,48 +1360,61 @@ class Clubhouse(Cog, name="Clubhouse"):
         channel: TextChannel = ctx.channel
         user: discord.Member = ctx.author
         overwrite = channel.overwrites.get(user)
-        if ((await db_thread(
-                lambda: db.query(Channel).filter_by(searcher_id=user.id, channel_id=channel.id).first()
-        ) is None
+        db_channel: Optional[PairingChannel] = self.channel_registry.get(channel.id)
+        if ((db_channel is None
+             or db_channel.searcher_id != user.id
              or overwrite is None
              or not overwrite.read_messages
         ) and self.team_role not in user.roles):
             await ctx.send(translations.f_chanenl_delete_denied(user.mention))
             return
-        if channel.category is None or channel.category.id not in map(
-                lambda x: x.category_id, await db_thread(db.all, Category)):
+        if channel.category_id not in self.categories:
             await ctx.send(translations.f_wrong_channel(user.mention))
             return
 
-        db_channel: Optional[Channel] = await db_thread(db.get, Channel, channel.id)
-        if await db_thread(db.get, Searcher, db_channel.searcher_id):
+        def close_process() -> Tuple[Optional[Searcher], Optional[Donator], bool]:
+            searcher_row, donator_row = transition(
+                searcher_id=db_channel.searcher_id,
+                searcher_state=State.DONE,
+                donator_id=db_channel.donator_id,
+            )
+            donator_done = bool(
+                donator_row
+                and donator_row.used_invites >= donator_row.invite_count
+                and db.query(Channel).filter_by(donator_id=donator_row.user_id).count() <= 1
+                and donator_row.state != State.ABORTED
+            )
+            if donator_done:
+                _, donator_row = transition(donator_id=donator_row.user_id, donator_state=State.DONE)
+            return searcher_row, donator_row, donator_done
+
+        searcher, donator, donator_done = await db_thread(close_process)
+        self.queue_index.sync_searcher(searcher)
+        self.queue_index.sync_donator(donator)
+        self.track_user(searcher, "close", channel.id)
+        self.track_user(donator, "close", channel.id)
+        if searcher:
             await self.send_to_dump(f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id}) auf DONE gesetzt"
                                     f" (Channel geschlossen)!")
-            await db_thread(Searcher.change_state, db_channel.searcher_id, State.DONE)
-        donator: Optional[Donator] = await db_thread(db.get, Donator, db_channel.donator_id)
-        if donator \
-                and donator.used_invites >= donator.invite_count \
-                and await db_thread(lambda: db.query(Channel).filter_by(donator_id=donator.user_id).count()) <= 1 and \
-                donator.state != State.ABORTED:
+        if donator_done:
             await self.send_to_dump(f"Einladender <@{db_channel.donator_id}> ({db_channel.donator_id}) auf DONE gesetzt"
                                     f" (Channel geschlossen)!")
-            await db_thread(Donator.change_state, db_channel.donator_id, State.DONE)
         if db_channel:
             users_to_notify: List[discord.Member] = [
                 u for u, o in channel.overwrites.items()
                 if isinstance(u, discord.Member) and u.id == db_channel.searcher_id
             ]
             if len(users_to_notify) > 0:
-                if not await db_thread(db.get, Donator, users_to_notify[0].id):
+                if not await repo.get(Donator, users_to_notify[0].id):
                     await self.send_dm_text(users_to_notify[0], translations.invite_user)
         try:
-            await db_thread(db.delete, db_channel)
+            await self.delete_db_channel(db_channel.channel_id)
             await self.chatlog(channel, translations.f_chatlog_closed_reason(
                 donator.user_id, self.guild.get_member(donator.user_id),
                 db_channel.searcher_id, self.guild.get_member(db_channel.searcher_id),
                 f"{user.mention} hat den Channel geschlossen (.close).",
             ))
-            await channel.delete()
+            await self.release_channel(channel)
         except (Forbidden, NotFound, HTTPException):
             pass
 
@@ -911,38 +1439,47 @@ class Clubhouse(Cog, name="Clubhouse"):
         channel: TextChannel = ctx.channel
         author: discord.Member = ctx.author
 
-        if channel.category is None or channel.category.id not in map(
-                lambda x: x.category_id, await db_thread(db.all, Category)):
+        if channel.category_id not in self.categories:
             await ctx.send(translations.f_wrong_channel(author.mention))
             return
 
-        db_channel: Optional[Channel] = await db_thread(db.get, Channel, channel.id)
-        searcher: Optional[Searcher] = await db_thread(db.get, Searcher, db_channel.searcher_id)
+        db_channel: Optional[PairingChannel] = self.channel_registry.get(channel.id)
+
+        def finish_process() -> Tuple[Optional[Searcher], Optional[Donator]]:
+            searcher_row, donator_row = transition(
+                searcher_id=db_channel.searcher_id,
+                searcher_state=State.DONE if db_channel.searcher_id == member.id else State.QUEUED,
+                donator_id=db_channel.donator_id,
+                used_invites_delta=0 if db_channel.donator_id == member.id else -1,
+            )
+            if donator_row and db_channel.donator_id == member.id \
+                    and donator_row.used_invites >= donator_row.invite_count \
+                    and db.query(Channel).filter_by(donator_id=donator_row.user_id).count() <= 1:
+                _, donator_row = transition(donator_id=donator_row.user_id, donator_state=State.DONE)
+            return searcher_row, donator_row
+
+        searcher, donator = await db_thread(finish_process)
+        self.queue_index.sync_searcher(searcher)
+        self.queue_index.sync_donator(donator)
+        self.track_user(searcher, "done", channel.id)
+        self.track_user(donator, "done", channel.id)
         if searcher:
             if db_channel.searcher_id == member.id:  # keep this separate ifs!
-                await db_thread(Searcher.change_state, db_channel.searcher_id, State.DONE)
                 await self.send_to_dump(
                     f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id}) auf DONE gesetzt,"
                     f" (done command)!")
             else:
-                await db_thread(Searcher.change_state, db_channel.searcher_id, State.QUEUED)
                 await self.send_to_dump(f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id}) auf QUEUED"
                                         f" gesetzt (Einladender wurde durch den done command rausgenommen)!")
-        donator: Optional[Donator] = await db_thread(db.get, Donator, db_channel.donator_id)
         if donator:
             if db_channel.donator_id == member.id:  # keep this separate ifs!
-                if donator.used_invites >= donator.invite_count \
-                        and await db_thread(
-                    lambda: db.query(Channel).filter_by(donator_id=donator.user_id).count()) <= 1:
-                    await db_thread(Donator.change_state, db_channel.donator_id, State.DONE)
                 await self.send_to_dump(
                     f"Einladender <@{db_channel.donator_id}> ({db_channel.donator_id}) auf DONE gesetzt"
                     f" (done command, und hat keine Einladungen mehr frei)!")
             else:
                 await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id}) hat jetzt"
-                                        f" {max(0, donator.used_invites - 1)} verbrauchte Einladungen"
+                                        f" {donator.used_invites} verbrauchte Einladungen"
                                         f" (done dem Suchenden)!")
-                await db_thread(Donator.change_used_invites, donator.user_id, max(0, donator.used_invites - 1))
         if db_channel:
             users_to_notify: List[discord.Member] = [
                 u for u, o in channel.overwrites.items()
@@ -951,16 +1488,16 @@ class Clubhouse(Cog, name="Clubhouse"):
             for user_to_notify in users_to_notify:
                 await self.send_dm_text(user_to_notify, translations.invite_user)
         try:
-            await db_thread(db.delete, db_channel)
+            await self.delete_db_channel(db_channel.channel_id)
             await self.chatlog(channel, translations.f_chatlog_closed_reason(
                 donator.user_id, self.guild.get_member(donator.user_id),
                 db_channel.searcher_id, self.guild.get_member(db_channel.searcher_id),
                 f"{author.mention} hat {member.mention} auf den Status DONE gesetzt.",
             ))
-            await channel.delete()
+            await self.release_channel(channel)
         except (Forbidden, NotFound, HTTPException):
             pass
-        await self.pair()
+        self.request_pairing()
 
     @commands.command(aliases=["r"])
     @guild_only()
@@ -982,10 +1519,7 @@ class Clubhouse(Cog, name="Clubhouse"):
             return
 
         db_channel = None
-        open_channels: List[Channel] = await db_thread(lambda: db.query(Channel).filter(or_(
-            member.id == Channel.donator_id,
-            member.id == Channel.searcher_id
-        )).all())
+        open_channels: List[PairingChannel] = self.channel_registry.of_user(member.id)
         if len(open_channels) > 0 and not force:
             if len(open_channels) > 1:
                 await ctx.send(translations.f_reset_multiple_channels(
@@ -996,16 +1530,24 @@ class Clubhouse(Cog, name="Clubhouse"):
                 await ctx.send(translations.f_reset_one_channels(member.mention, open_channels[0].channel_id))
                 return
 
+        def delete_user() -> Tuple[Optional[Donator], Optional[Searcher]]:
+            rows = db.get(Donator, member.id), db.get(Searcher, member.id)
+            for row in filter(None, rows):
+                db.delete(row)
+            return rows
+
         found = 0
-        donator: Optional[Donator] = await db_thread(db.get, Donator, member.id)
+        donator, searcher = await db_thread(delete_user)
+        self.channel_registry.forget_user(member.id)
+        for row in filter(None, (donator, searcher)):
+            self.track_deleted(row, "reset")
         if donator:
-            await db_thread(db.delete, donator)
+            self.queue_index.discard_donator(member.id)
             await self.send_to_dump(f"Einladender <@{member.id}> ({member.id}) aus der Datenbank gelöscht, "
                                     f" (reset)!")
             found += 1
-        searcher: Optional[Searcher] = await db_thread(db.get, Searcher, member.id)
         if searcher:
-            await db_thread(db.delete, searcher)
+            self.queue_index.discard_searcher(member.id)
             await self.send_to_dump(f"Suchender <@{member.id}> ({member.id}) aus der Datenbank gelöscht, "
                                     f" (reset)!")
             found += 1
@@ -1016,27 +1558,31 @@ class Clubhouse(Cog, name="Clubhouse"):
             await ctx.send(translations.f_user_resetted(member.mention))
             for db_channel in open_channels:
                 other_id = 0
-                if not donator:
-                    donator = await db_thread(db.get, Donator, db_channel.donator_id)
-                    if donator:
-                        await db_thread(Donator.change_used_invites, donator.user_id, max(0, donator.used_invites - 1))
-                        await self.send_to_dump(
-                            f"Einladender <@{donator.user_id}> ({donator.user_id})"
-                            f" hat jetzt {max(0, donator.used_invites - 1)}"
-                            f" Einladungen verbraucht (Suchender wurde resetted)")
-                        other_id = donator.user_id
-                if not searcher:
-                    searcher = await db_thread(db.get, Searcher, db_channel.searcher_id)
-                    if searcher and member.id != searcher.user_id:
-                        await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED)
-                        await self.send_to_dump(f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id})"
-                                                f" auf QUEUED gesetzt (Einladender wurde resetted)")
-                        other_id = searcher.user_id
+                other_searcher, other_donator = await self.transition(
+                    "reset",
+                    db_channel.channel_id,
+                    donator_id=None if donator else db_channel.donator_id,
+                    used_invites_delta=-1,
+                    searcher_id=None if searcher else db_channel.searcher_id,
+                    searcher_state=State.QUEUED,
+                )
+                if other_donator:
+                    donator = other_donator
+                    await self.send_to_dump(
+                        f"Einladender <@{donator.user_id}> ({donator.user_id})"
+                        f" hat jetzt {donator.used_invites}"
+                        f" Einladungen verbraucht (Suchender wurde resetted)")
+                    other_id = donator.user_id
+                if other_searcher:
+                    searcher = other_searcher
+                    await self.send_to_dump(f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id})"
+                                            f" auf QUEUED gesetzt (Einladender wurde resetted)")
+                    other_id = searcher.user_id
                 if other_id != 0 and (other_user := self.bot.get_user(other_id)) is not None:
                     await self.send_dm_text(other_user, translations.f_channel_was_closed_by_team(member.mention))
 
                 channel: Optional[TextChannel] = self.bot.get_channel(db_channel.channel_id)
-                await db_thread(db.delete, db_channel)
+                await self.delete_db_channel(db_channel.channel_id)
                 try:
                     if channel:
                         await self.chatlog(channel, translations.f_chatlog_closed_reason(
@@ -1044,11 +1590,11 @@ class Clubhouse(Cog, name="Clubhouse"):
                             searcher.user_id, self.guild.get_member(searcher.user_id),
                             f"{ctx.author.mention} hat {member.mention} zurückgesetzt.",
                         ))
-                        await channel.delete()
+                        await self.release_channel(channel)
                 except Exception as e:
                     sentry_sdk.capture_exception(e)
             if db_channel:
-                await self.pair()
+                self.request_pairing()
 
         # - increase count if param
         await self.send_dm_text(member, translations.resetted_by_team)
@@ -1061,19 +1607,17 @@ class Clubhouse(Cog, name="Clubhouse"):
         """
         if ctx.message.author.bot:
             return
-        searching_users: int = await db_thread(
-            lambda: db.query(Searcher).filter_by(state=State.QUEUED).count())
-
-        active_donator_list: List[Donator] = await db_thread(
-            lambda: db.query(Donator).filter_by(state=State.QUEUED))
+        searching_users, active_donator_list, channel_count, completed_searchers = await repo.run(
+            lambda session: (
+                session.query(Searcher).filter_by(state=State.QUEUED).count(),
+                session.query(Donator).filter_by(state=State.QUEUED).all(),
+                session.query(Channel).count(),
+                session.query(Searcher).filter_by(state=State.DONE).count(),
+            )
+        )
 
         active_donations = sum(u.invite_count - u.used_invites for u in active_donator_list)
 
-        channel_count: int = await db_thread(db.count, Channel)
-
-        completed_searchers: int = await db_thread(
-            lambda: db.query(Searcher).filter_by(state=State.DONE).count())
-
         embed: discord.Embed = discord.Embed(title="Statistiken")
         embed.add_field(name="Suchende User", value=str(searching_users), inline=False)
         embed.add_field(name="Angebotene Einladungen", value=active_donations, inline=False)
@@ -1081,6 +1625,155 @@ class Clubhouse(Cog, name="Clubhouse"):
         embed.add_field(name="Verschenkte Einladungen", value=str(completed_searchers), inline=False)
         await ctx.send(embed=embed)
 
+    @commands.command(aliases=["dms"])
+    @guild_only()
+    async def dm_status(self, ctx: Context):
+        """
+        team only
+        show the state of the dm dispatcher
+        """
+        if ctx.message.author.bot:
+            return
+        if self.team_role not in ctx.author.roles:
+            await ctx.send(translations.f_permission_denied(ctx.author.mention))
+            return
+
+        metrics = self.dms.metrics
+        embed: discord.Embed = discord.Embed(title="DM Dispatcher")
+        embed.add_field(name="Warteschlange", value=str(self.dms.queue_depth), inline=True)
+        embed.add_field(name="In Bearbeitung", value=str(len(self.dms.in_flight)), inline=True)
+        embed.add_field(name="Gesendet", value=str(metrics.sent), inline=True)
+        embed.add_field(name="Latenz (Durchschnitt / Max)",
+                        value=f"{metrics.latency_avg:.2f}s / {metrics.latency_max:.2f}s", inline=True)
+        embed.add_field(name="Rate Limits (429)", value=str(metrics.rate_limited), inline=True)
+        embed.add_field(name="DMs deaktiviert (403)", value=str(metrics.forbidden), inline=True)
+        embed.add_field(name="Fehler", value=str(metrics.failed), inline=True)
+        embed.add_field(name="Zusammengefasst", value=str(metrics.coalesced), inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["rs"])
+    @guild_only()
+    async def reaction_status(self, ctx: Context):
+        """
+        team only
+        show the state of the reaction intake of the start message
+        """
+        if ctx.message.author.bot:
+            return
+        if self.team_role not in ctx.author.roles:
+            await ctx.send(translations.f_permission_denied(ctx.author.mention))
+            return
+
+        metrics = self.reactions.metrics
+        embed: discord.Embed = discord.Embed(title="Reaktionen")
+        embed.add_field(name="Wartende User", value=f"{self.reactions.pending} / {self.reactions.max_pending}",
+                        inline=True)
+        embed.add_field(name="In Bearbeitung", value=str(self.reactions.active), inline=True)
+        embed.add_field(name="Maximal wartend", value=str(metrics.max_pending), inline=True)
+        embed.add_field(name="Empfangen", value=str(metrics.received), inline=True)
+        embed.add_field(name="Bearbeitet", value=str(metrics.processed), inline=True)
+        embed.add_field(name="Zusammengefasst", value=str(metrics.coalesced), inline=True)
+        embed.add_field(name="Verworfen (Warteschlange voll)", value=str(metrics.dropped), inline=True)
+        embed.add_field(name="Fehler", value=str(metrics.failed), inline=True)
+        embed.add_field(name="Entfernt",
+                        value=f"{metrics.removed} ({metrics.cleared} Clears), {self.reactions.pending_removals} offen",
+                        inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["ps"])
+    @guild_only()
+    async def pool_status(self, ctx: Context):
+        """
+        team only
+        show the state of the channel pool
+        """
+        if ctx.message.author.bot:
+            return
+        if self.team_role not in ctx.author.roles:
+            await ctx.send(translations.f_permission_denied(ctx.author.mention))
+            return
+
+        metrics = self.channel_pool.metrics
+        embed: discord.Embed = discord.Embed(title="Channel Pool")
+        capacity: int = self.channel_pool.size * len(self.categories)
+        embed.add_field(name="Freie Channel", value=f"{len(self.channel_pool)} / {capacity}", inline=True)
+        embed.add_field(name="Trefferquote",
+                        value=f"{metrics.hit_rate:.0%} ({metrics.hits} / {metrics.hits + metrics.misses})", inline=True)
+        embed.add_field(name="Zeit bis zum Channel (Pool / neu)",
+                        value=f"{metrics.pool_time_avg:.2f}s / {metrics.new_time_avg:.2f}s", inline=True)
+        embed.add_field(name="Zurückgegeben", value=str(metrics.returned), inline=True)
+        embed.add_field(name="Gelöscht", value=str(metrics.deleted), inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["rld"])
+    @guild_only()
+    async def reload_settings(self, ctx: Context):
+        """
+        team only
+        read the settings from the database again, e.g. after the permission roles were changed there
+        """
+        if ctx.message.author.bot:
+            return
+        if self.team_role not in ctx.author.roles:
+            await ctx.send(translations.f_permission_denied(ctx.author.mention))
+            return
+
+        clear_settings_cache()
+        # the cached levels were resolved with the old role config
+        invalidate_permission_level()
+        await ctx.send("Einstellungen neu geladen.")
+
+    @commands.command(aliases=["rms"])
+    @guild_only()
+    async def reminder_status(self, ctx: Context):
+        """
+        team only
+        show the gift reminders sent since the start of the bot
+        """
+        if ctx.message.author.bot:
+            return
+        if self.team_role not in ctx.author.roles:
+            await ctx.send(translations.f_permission_denied(ctx.author.mention))
+            return
+
+        metrics = self.reminder_metrics
+        embed: discord.Embed = discord.Embed(title="Erinnerungen")
+        embed.add_field(name="Durchläufe", value=str(metrics.runs), inline=True)
+        embed.add_field(name="Gesendet", value=str(metrics.sent), inline=True)
+        embed.add_field(name="Unterdrückt", value=str(metrics.suppressed), inline=True)
+        embed.add_field(name="Fehler", value=str(metrics.failed), inline=True)
+        last_run = metrics.last_run.strftime("%Y-%m-%d %H:%M:%S") if metrics.last_run else "-"
+        embed.add_field(name="Letzter Durchlauf (UTC)", value=last_run, inline=True)
+        embed.add_field(name="Geplant", value=str(self.scheduler.pending(GIFT_REMINDER)), inline=True)
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["dmf"])
+    @guild_only()
+    async def dm_in_flight(self, ctx: Context, clear: Optional[bool] = False):
+        """
+        team only
+        list the dms that are queued or being sent, entries expire after DM_DEDUP_TTL seconds
+        clear: drop all entries, so stuck dms can be sent again
+        """
+        if ctx.message.author.bot:
+            return
+        if self.team_role not in ctx.author.roles:
+            await ctx.send(translations.f_permission_denied(ctx.author.mention))
+            return
+
+        entries = self.dms.in_flight.entries()
+        if clear:
+            for key, entry in entries:
+                self.dms.in_flight.discard(key, entry.owner)
+            await ctx.send(f"{len(entries)} Einträge entfernt")
+            return
+
+        embed: discord.Embed = discord.Embed(title="DMs in Bearbeitung")
+        embed.description = "\n".join(
+            f"<@{user_id}> `{digest}` {entry.age:.0f}s: {entry.preview}" for (user_id, digest), entry in entries
+        ) or "Keine DMs in Bearbeitung"
+        await send_long_embed(ctx, embed)
+
     @commands.command(aliases=["q"])
     @guild_only()
     async def queue(self, ctx: Context):
@@ -1094,11 +1787,13 @@ class Clubhouse(Cog, name="Clubhouse"):
             await ctx.send(translations.f_permission_denied(ctx.author.mention))
             return
 
-        searching_users: str = "\n".join(f"<@{user.user_id}>" for user in (await self.calculate_queues())[0])
+        searchers, donators = await self.calculate_queues()
+
+        searching_users: str = "\n".join(f"<@{user.user_id}>" for user in searchers)
 
         active_donator_list: str = "\n".join(
             f"<@{user.user_id}> ({user.invite_count - user.used_invites})"
-            for user in (await self.calculate_queues())[1])
+            for user in donators)
 
         embed: discord.Embed = discord.Embed(title="Warteschlange", color=0x1bcc79)
         embed.add_field(name="Suchende User", value=searching_users or "Keine suchenden User", inline=True)
@@ -1126,18 +1821,15 @@ class Clubhouse(Cog, name="Clubhouse"):
         #   2. alle searcher, die keinen channel haben
 
         # s: Set[int] = set(await db_thread(lambda x: x.user_id, db.query(Searcher).filter_by(state=State.DONE).all()))
-        s: set[int] = set(
-            map(lambda x: x.user_id, await db_thread(lambda: db.query(Searcher).filter_by(state=State.DONE).all())))
+        s: set[int] = set(map(lambda x: x.user_id, await repo.all(Searcher, state=State.DONE)))
         # set(map(lambda y: y.user_id, x))
         # s: Set[Searcher] = set(await db_thread(lambda: db.query(Searcher).filter_by(state=State.DONE).all()))
 
-        t: set[int] = set(
-            map(lambda x: x.user_id, await db_thread(lambda: db.query(Donator).filter_by(state=State.DONE).all())))
+        t: set[int] = set(map(lambda x: x.user_id, await repo.all(Donator, state=State.DONE)))
 
         missing = s - t
 
-        c: set[int] = set(
-            map(lambda x: x.donator_id, await db_thread(lambda: db.query(Channel).all())))
+        c: set[int] = set(map(lambda x: x.donator_id, await repo.all(Channel)))
 
         coupled = missing & c
         not_coupled = missing - c
@@ -1204,40 +1896,44 @@ class Clubhouse(Cog, name="Clubhouse"):
             await ctx.send(translations.f_permission_denied(ctx.author.mention))
             return
 
-        if ctx.channel.category is None or ctx.channel.category.id not in map(
-                lambda x: x.category_id, await db_thread(db.all, Category)):
+        if ctx.channel.category_id not in self.categories:
             await ctx.send(translations.f_wrong_channel(ctx.author.mention))
             return
 
-        db_channel: Optional[Channel] = await db_thread(db.get, Channel, ctx.channel.id)
+        db_channel: Optional[PairingChannel] = self.channel_registry.get(ctx.channel.id)
         if db_channel:
-            if await db_thread(db.get, Searcher, db_channel.searcher_id):
+            searcher, donator = await self.transition(
+                "requeue",
+                db_channel.channel_id,
+                searcher_id=db_channel.searcher_id,
+                searcher_state=State.QUEUED,
+                donator_id=db_channel.donator_id,
+                used_invites_delta=-1,
+            )
+            if searcher:
                 await self.send_to_dump(f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id})"
                                         f" wurde zurück auf QUEUED gesetzt"
                                         f" (requeue)")
-                await db_thread(Searcher.change_state, db_channel.searcher_id, State.QUEUED)
-            donator: Optional[Donator] = await db_thread(db.get, Donator, db_channel.donator_id)
             if donator:
                 await self.send_to_dump(
                     f"Einladender <@{donator.user_id}> ({donator.user_id})"
-                    f" hat jetzt  {max(0, donator.used_invites - 1)}"
+                    f" hat jetzt  {donator.used_invites}"
                     f" Einladungen verbraucht (requeue)")
-                await db_thread(Donator.change_used_invites, donator.user_id, max(0, donator.used_invites - 1))
             for db_user in [db_channel.searcher_id, db_channel.donator_id]:
                 user: Optional[discord.Member] = self.guild.get_member(db_user)
                 if user:
                     await self.send_dm_text(user, translations.back_to_queue)
         try:
-            await db_thread(db.delete, db_channel)
+            await self.delete_db_channel(db_channel.channel_id)
             await self.chatlog(ctx.channel, translations.f_chatlog_closed_reason(
                 db_channel.donator_id, self.guild.get_member(db_channel.donator_id),
                 db_channel.searcher_id, self.guild.get_member(db_channel.searcher_id),
                 f"{ctx.author.mention} hat die beiden zurück in die Warteschlange gesteckt.",
             ))
-            await ctx.channel.delete()
+            await self.release_channel(ctx.channel)
         except (Forbidden, NotFound, HTTPException):
             pass
-        await self.pair()
+        self.request_pairing()
 
     @commands.command(aliases=["self"])
     async def self_info(self, ctx: Context):
@@ -1248,45 +1944,27 @@ class Clubhouse(Cog, name="Clubhouse"):
             return
         await ctx.message.add_reaction(name_to_emoji["white_check_mark"])
 
-        donator: Optional[Donator] = await db_thread(
-            lambda: db.query(Donator)
-                .filter_by(user_id=ctx.author.id)
-                .filter(Donator.state.in_((State.INITIAL, State.QUEUED, State.MATCHED)))
-                .first()
-        )
+        active = (State.INITIAL, State.QUEUED, State.MATCHED)
+        donator, searcher = await repo.get_user(ctx.author.id)
+        donator: Optional[Donator] = donator if donator and donator.state in active else None
+        searcher: Optional[Searcher] = searcher if searcher and searcher.state in active else None
         if donator:
             if donator.state == State.INITIAL:
                 await self.send_dm_text(ctx.author, translations.gift_reminder)
             if donator.state == State.QUEUED:
-                _, donating_users = await self.calculate_queues()
-                index = 0
-                for donator2 in donating_users:
-                    index += 1
-                    if donator2.user_id == donator.user_id:
-                        break
                 await self.send_dm_text(ctx.author, translations.f_self_queue_status(
-                    str(donator.invite_count - donator.used_invites), index))
+                    str(donator.invite_count - donator.used_invites),
+                    self.get_queue_position(donator.user_id, donator=True)))
             if donator.state == State.MATCHED:
                 await self.send_dm_text(ctx.author, translations.already_in_room)
             return
 
-        searcher: Optional[Searcher] = await db_thread(
-            lambda: db.query(Searcher)
-                .filter_by(user_id=ctx.author.id)
-                .filter(Searcher.state.in_((State.INITIAL, State.QUEUED, State.MATCHED)))
-                .first()
-        )
         if searcher:
             if searcher.state == State.INITIAL:
                 await self.send_dm_text(ctx.author, translations.read_again)
             if searcher.state == State.QUEUED:
-                searching_users, _ = await self.calculate_queues()
-                index = 0
-                for searcher2 in searching_users:
-                    index += 1
-                    if searcher2.user_id == searcher.user_id:
-                        break
-                await self.send_dm_text(ctx.author, translations.f_self_still_in_queue(index))
+                await self.send_dm_text(ctx.author, translations.f_self_still_in_queue(
+                    self.get_queue_position(searcher.user_id)))
             if searcher.state == State.MATCHED:
                 await self.send_dm_text(ctx.author, translations.already_in_room)
             return
@@ -1313,21 +1991,11 @@ class Clubhouse(Cog, name="Clubhouse"):
             await ctx.send(translations.member_not_found)
             return
 
-        searcher: Optional[Searcher] = await db_thread(
-            lambda: db.query(Searcher)
-                .filter_by(user_id=member.id)
-                .first()
-        )
+        donator, searcher = await repo.get_user(member.id)
         if searcher:
             position = ""
             if searcher.state == State.QUEUED:
-                searching_users, _ = await self.calculate_queues()
-                index = 0
-                for searcher2 in searching_users:
-                    index += 1
-                    if searcher2.user_id == searcher.user_id:
-                        break
-                position = f"\nPosition: {index}"
+                position = f"\nPosition: {self.get_queue_position(searcher.user_id)}"
             embed: discord.Embed = discord.Embed(
                 title=f"Searcher Status",
                 description=f"Suchender: <@{searcher.user_id}>\nState: {searcher.state}{position}"
@@ -1335,20 +2003,10 @@ class Clubhouse(Cog, name="Clubhouse"):
             )
             await ctx.send(embed=embed)
 
-        donator: Optional[Donator] = await db_thread(
-            lambda: db.query(Donator)
-                .filter_by(user_id=member.id)
-                .first()
-        )
         if donator:
             index = 0
             if donator.state == State.QUEUED:
-                _, donating_users = await self.calculate_queues()
-                index = 0
-                for donator2 in donating_users:
-                    index += 1
-                    if donator2.user_id == donator.user_id:
-                        break
+                index = self.get_queue_position(donator.user_id, donator=True)
             used_count = donator.invite_count - donator.used_invites
             used = f' (noch {used_count} von {donator.invite_count} Einladungen verfügbar.)'
             description = f"Einladender: <@{donator.user_id}>\nState: {donator.state}"
@@ -1389,25 +2047,19 @@ class Clubhouse(Cog, name="Clubhouse"):
             await ctx.send(translations.member_not_found)
             return
 
-        searcher: Optional[Searcher] = await db_thread(
-            lambda: db.query(Searcher)
-                .filter_by(user_id=member.id)
-                .first()
+        searcher, _ = await self.transition(
+            "move_to_top", searcher_id=member.id, enqueued_at=datetime(1970, 1, 1, 0, 0, 0)
         )
         if searcher:
-            await db_thread(Searcher.change_timestamp, user_id=member.id, timestamp=datetime(1970, 1, 1, 0, 0, 0))
             await self.send_to_dump(f"Suchender <@{searcher.user_id}> ({searcher.user_id})"
                                     f" wurde an die Spitze der Warteschlange geschoben.")
             await ctx.send(f"Moved {member.mention} to the top of the queue.")
             return
 
-        donator: Optional[Donator] = await db_thread(
-            lambda: db.query(Donator)
-                .filter_by(user_id=member.id)
-                .first()
+        _, donator = await self.transition(
+            "move_to_top", donator_id=member.id, last_contact=datetime(1970, 1, 1, 0, 0, 0)
         )
         if donator:
-            await db_thread(Donator.change_timestamp, user_id=member.id, timestamp=datetime(1970, 1, 1, 0, 0, 0))
             await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id})"
                                     f" wurde an die Spitze der Warteschlange geschoben.")
             await ctx.send(f"Moved {member.mention} to the top of the queue.")
@@ -1451,25 +2103,23 @@ class Clubhouse(Cog, name="Clubhouse"):
             return
 
         channel: TextChannel = ctx.channel
-        if channel.category is None or channel.category.id not in map(lambda x: x.category_id,
-                                                                      await db_thread(db.all, Category)):
+        if channel.category_id not in self.categories:
             await ctx.send(translations.f_rm_channel(member.mention))
             return
 
         db_channel = None
-        for db_channel in await db_thread(lambda: db.query(Channel)
-                .filter(or_(member.id == Channel.donator_id, member.id == Channel.searcher_id)).all()):
+        for db_channel in self.channel_registry.of_user(member.id):
 
             donator = await db_thread(db.get, Donator, db_channel.donator_id)
             other_id = 0
             if donator:
                 if member.id == donator.user_id:
-                    await db_thread(Donator.change_state, member.id, State.ABORTED)
+                    self.queue_index.sync_donator(await db_thread(Donator.change_state, member.id, State.ABORTED))
                     await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id})"
                                             f" wurde auf ABORTED gesetzt (aus dem Prozess gebannt)")
                 else:
-                    await db_thread(Donator.change_used_invites, donator.user_id,
-                                    max(0, donator.used_invites - 1))
+                    self.queue_index.sync_donator(await db_thread(Donator.change_used_invites, donator.user_id,
+                                                                  max(0, donator.used_invites - 1)))
                     await self.send_to_dump(f"Einladender <@{donator.user_id}> ({donator.user_id}) hat jetzt"
                                             f" {max(0, donator.used_invites - 1)} verbrauchte Einladungen"
                                             f" (Suchender aus dem Prozess gebannt)!")
@@ -1478,20 +2128,22 @@ class Clubhouse(Cog, name="Clubhouse"):
             searcher = await db_thread(db.get, Searcher, db_channel.searcher_id)
             if searcher:
                 if member.id == searcher.user_id:
-                    await db_thread(Searcher.change_state, searcher.user_id, State.ABORTED)
+                    self.queue_index.sync_searcher(
+                        await db_thread(Searcher.change_state, searcher.user_id, State.ABORTED))
                     await self.send_to_dump(f"Suchender <@{searcher.user_id}> ({searcher.user_id})"
                                             f" wurde auf ABORTED gesetzt (aus dem Prozess gebannt)")
                 else:
                     await self.send_to_dump(f"Suchender <@{searcher.user_id}> ({searcher.user_id})"
                                             f" wurde zurück auf QUEUED gesetzt (Einladender aus dem Prozess gebannt)")
-                    await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED)
+                    self.queue_index.sync_searcher(
+                        await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED))
                     other_id = searcher.user_id
 
             if other_id != 0 and (other_user := self.bot.get_user(other_id)) is not None:
                 await self.send_dm_text(other_user, translations.f_channel_was_closed_by_team(member.mention))
 
             channel: Optional[TextChannel] = self.bot.get_channel(db_channel.channel_id)
-            await db_thread(db.delete, db_channel)
+            await self.delete_db_channel(db_channel.channel_id)
             try:
                 if channel:
                     await self.chatlog(ctx.channel, translations.f_chatlog_closed_reason(
@@ -1499,18 +2151,15 @@ class Clubhouse(Cog, name="Clubhouse"):
                         db_channel.searcher_id, self.guild.get_member(db_channel.searcher_id),
                         f"{ctx.author.mention} hat {member.mention} den Status ABORTED zugewiesen.",
                     ))
-                    await channel.delete()
+                    await self.release_channel(channel)
             except Exception as e:
                 sentry_sdk.capture_exception(e)
         if db_channel:
-            await self.pair()
+            self.request_pairing()
         await self.send_dm_text(member, translations.f_channel_was_closed_by_team(member.mention))
 
         db_channel = None
-        open_channels: List[Channel] = await db_thread(lambda: db.query(Channel).filter(or_(
-            member.id == Channel.donator_id,
-            member.id == Channel.searcher_id
-        )).all())
+        open_channels: List[PairingChannel] = self.channel_registry.of_user(member.id)
         if len(open_channels) > 0 and not force:
             if len(open_channels) > 1:
                 await ctx.send(translations.f_reset_multiple_channels(
@@ -1525,15 +2174,20 @@ class Clubhouse(Cog, name="Clubhouse"):
         donator: Optional[Donator] = await db_thread(db.get, Donator, member.id)
         if donator:
             await db_thread(db.delete, donator)
+            self.queue_index.discard_donator(member.id)
             await self.send_to_dump(f"Einladender <@{member.id}> ({member.id}) aus der Datenbank gelöscht, "
                                     f" (reset)!")
             found += 1
         searcher: Optional[Searcher] = await db_thread(db.get, Searcher, member.id)
         if searcher:
             await db_thread(db.delete, searcher)
+            self.queue_index.discard_searcher(member.id)
             await self.send_to_dump(f"Suchender <@{member.id}> ({member.id}) aus der Datenbank gelöscht, "
                                     f" (reset)!")
             found += 1
+        self.channel_registry.forget_user(member.id)
+        for row in filter(None, (donator, searcher)):
+            self.track_deleted(row, "reset")
         if found == 0:
             await ctx.send(translations.f_user_not_found(member.mention))
             return
@@ -1544,7 +2198,8 @@ class Clubhouse(Cog, name="Clubhouse"):
                 if not donator:
                     donator = await db_thread(db.get, Donator, db_channel.donator_id)
                     if donator:
-                        await db_thread(Donator.change_used_invites, donator.user_id, max(0, donator.used_invites - 1))
+                        self.queue_index.sync_donator(await db_thread(Donator.change_used_invites, donator.user_id,
+                                                                      max(0, donator.used_invites - 1)))
                         await self.send_to_dump(
                             f"Einladender <@{donator.user_id}> ({donator.user_id})"
                             f" hat jetzt {max(0, donator.used_invites - 1)}"
@@ -1553,7 +2208,8 @@ class Clubhouse(Cog, name="Clubhouse"):
                 if not searcher:
                     searcher = await db_thread(db.get, Searcher, db_channel.searcher_id)
                     if searcher and member.id != searcher.user_id:
-                        await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED)
+                        self.queue_index.sync_searcher(
+                            await db_thread(Searcher.change_state, searcher.user_id, State.QUEUED))
                         await self.send_to_dump(f"Suchender <@{db_channel.searcher_id}> ({db_channel.searcher_id})"
                                                 f" auf QUEUED gesetzt (Einladender wurde resetted)")
                         other_id = searcher.user_id
@@ -1561,7 +2217,7 @@ class Clubhouse(Cog, name="Clubhouse"):
                     await self.send_dm_text(other_user, translations.f_channel_was_closed_by_team(member.mention))
 
                 channel: Optional[TextChannel] = self.bot.get_channel(db_channel.channel_id)
-                await db_thread(db.delete, db_channel)
+                await self.delete_db_channel(db_channel.channel_id)
                 try:
                     if channel:
                         await self.chatlog(channel, translations.f_chatlog_closed_reason(
@@ -1569,11 +2225,11 @@ class Clubhouse(Cog, name="Clubhouse"):
                             searcher.user_id, self.guild.get_member(searcher.user_id),
                             f"{ctx.author.mention} hat {member.mention} zurückgesetzt.",
                         ))
-                        await channel.delete()
+                        await self.release_channel(channel)
                 except Exception as e:
                     sentry_sdk.capture_exception(e)
             if db_channel:
-                await self.pair()
+                self.request_pairing()
 
         # - increase count if param
         await self.send_dm_text(member, translations.resetted_by_team)
@@ -1592,6 +2248,9 @@ class Clubhouse(Cog, name="Clubhouse"):
             session.query(Channel).delete()
             session.query(Donator).delete()
             session.commit()
+            self.queue_index.clear()
+            self.channel_registry.clear()
+            self.participants.clear()
             await ctx.send("Done")
 
         @commands.command()
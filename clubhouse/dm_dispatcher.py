@@ -0,0 +1,254 @@
+import asyncio
+from asyncio import Queue, Future, Task
+from hashlib import blake2b
+from time import monotonic
+from typing import Optional, Union, Dict, Tuple, List, Callable, Awaitable, Any
+
+import discord
+from discord import Embed, Forbidden, HTTPException
+
+User = Union[discord.User, discord.Member]
+# user id, hash of the text or embed description
+DMKey = Tuple[int, str]
+
+
+def dm_key(user_id: int, payload: Optional[str]) -> DMKey:
+    return user_id, blake2b((payload or "").encode(), digest_size=8).hexdigest()
+
+
+class InFlightEntry:
+    def __init__(self, owner: object, preview: str):
+        self.owner = owner
+        self.preview = preview
+        self.registered_at = monotonic()
+
+    @property
+    def age(self) -> float:
+        return monotonic() - self.registered_at
+
+
+class InFlightRegistry:
+    """
+    keys of the dms that are currently queued or being sent
+    an entry expires after `ttl` seconds, so a send that never finished does not block the same dm forever
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[DMKey, InFlightEntry] = {}
+
+    def __len__(self) -> int:
+        self.expire()
+        return len(self._entries)
+
+    def __contains__(self, key: DMKey) -> bool:
+        entry = self._entries.get(key)
+        if entry is not None and entry.age >= self.ttl:
+            del self._entries[key]
+            return False
+        return entry is not None
+
+    def add(self, key: DMKey, owner: object, preview: str) -> bool:
+        """
+        register the key for owner, returns False if it is already in flight
+        """
+        if key in self:
+            return False
+        self._entries[key] = InFlightEntry(owner, preview)
+        return True
+
+    def discard(self, key: DMKey, owner: object):
+        # an expired entry may have been taken over by a newer send in the meantime
+        entry = self._entries.get(key)
+        if entry is not None and entry.owner is owner:
+            del self._entries[key]
+
+    def expire(self) -> int:
+        expired = [key for key, entry in self._entries.items() if entry.age >= self.ttl]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def entries(self) -> List[Tuple[DMKey, InFlightEntry]]:
+        self.expire()
+        return sorted(self._entries.items(), key=lambda item: item[1].registered_at)
+
+
+class TokenBucket:
+    """
+    allows `burst` sends at once and refills `rate` tokens per second
+    a rate of 0 does not pace at all, only block() holds the sends back
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self._blocked_until = 0.0
+
+    def block(self, seconds: float):
+        """
+        stop handing out tokens for the given time (e.g. after a 429 with retry_after)
+        """
+        self._blocked_until = max(self._blocked_until, monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            now = monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class DMMetrics:
+    def __init__(self):
+        self.sent = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.forbidden = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record_latency(self, latency: float):
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.sent if self.sent else 0.0
+
+
+class DMJob:
+    def __init__(self, user: User, text: Optional[str], embed: Optional[Embed], future: Future):
+        self.user = user
+        self.text = text
+        self.embed = embed
+        self.future = future
+        self.enqueued_at = monotonic()
+
+    @property
+    def payload(self) -> Optional[str]:
+        return self.text if self.embed is None else self.embed.description
+
+    @property
+    def key(self) -> DMKey:
+        return dm_key(self.user.id, self.payload)
+
+
+class DMDispatcher:
+    """
+    sends direct messages from a queue with a fixed number of workers
+    sends can be paced by a token bucket, a 429 pauses all workers for the retry_after of the response
+    identical sends (same user and text or embed description) that are still in flight are coalesced,
+    see InFlightRegistry
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        rate: float,
+        burst: int,
+        dedup_ttl: float,
+        on_forbidden: Callable[[User], Awaitable],
+        on_error: Callable[[User, HTTPException], Awaitable],
+    ):
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self.metrics = DMMetrics()
+        self._on_forbidden = on_forbidden
+        self._on_error = on_error
+        self._queue: Optional[Queue] = None
+        self._tasks: List[Task] = []
+        self.in_flight = InFlightRegistry(dedup_ttl)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self):
+        if self._queue is None:
+            self._queue = Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.get_running_loop().create_task(self._worker()))
+
+    def submit(self, user: User, text: Optional[str] = None, embed: Optional[Embed] = None) -> Optional[Future]:
+        """
+        queue a dm without waiting for it
+        returns the future of the delivery, or None if an identical dm is already in flight
+        """
+        self.start()
+        job = DMJob(user, text, embed, asyncio.get_running_loop().create_future())
+        if not self.in_flight.add(job.key, job, (job.payload or "")[:50]):
+            self.metrics.coalesced += 1
+            return None
+        self._queue.put_nowait(job)
+        # fire and forget callers never look at the result, failures are reported by on_forbidden and on_error
+        job.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        return job.future
+
+    async def send(self, user: User, text: Optional[str] = None, embed: Optional[Embed] = None) -> bool:
+        """
+        queue a dm and wait for its delivery
+        returns True if it was sent, False if it could not be sent or an identical dm was already in flight
+        """
+        future = self.submit(user, text, embed)
+        if future is None:
+            return False
+        return await future
+
+    async def _worker(self):
+        while True:
+            job: DMJob = await self._queue.get()
+            try:
+                result: Any = await self._deliver(job)
+            except Exception as e:
+                result = e
+            finally:
+                self.in_flight.discard(job.key, job)
+                self._queue.task_done()
+
+            if job.future.done():
+                continue
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+    async def _deliver(self, job: DMJob) -> bool:
+        while True:
+            await self.bucket.acquire()
+            try:
+                await job.user.send(job.text, embed=job.embed)
+            except Forbidden:
+                self.metrics.forbidden += 1
+                await self._on_forbidden(job.user)
+                return False
+            except HTTPException as e:
+                if e.status != 429:
+                    self.metrics.failed += 1
+                    await self._on_error(job.user, e)
+                    raise
+                self.metrics.rate_limited += 1
+                self.bucket.block(retry_after(e))
+            else:
+                self.metrics.sent += 1
+                self.metrics.record_latency(monotonic() - job.enqueued_at)
+                return True
+
+
+def retry_after(error: HTTPException, default: float = 5.0) -> float:
+    try:
+        return float(error.response.headers.get("Retry-After", default))
+    except (AttributeError, TypeError, ValueError):
+        return default
@@ -0,0 +1,112 @@
+import asyncio
+from asyncio import Event, Lock, Task, TimeoutError, wait_for
+from datetime import datetime
+from io import BytesIO
+from typing import List, Optional
+
+import sentry_sdk
+from discord import File, TextChannel
+
+# discord message length limit
+MESSAGE_LIMIT = 2000
+
+
+def pack_lines(lines: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    join lines into as few messages as possible, lines that are too long on their own are split
+    """
+    messages: List[str] = []
+    current = ""
+    for line in lines:
+        while len(line) > limit:
+            if current:
+                messages.append(current)
+                current = ""
+            messages.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            messages.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+class DumpLogger:
+    """
+    buffers the lines for the bot dump channel and sends them combined, so logging never waits for discord
+    the buffer is flushed every `interval` seconds or as soon as it fills a whole message
+    batches that would need more than `file_threshold` messages are sent as a text file instead
+    """
+
+    def __init__(self, interval: float, file_threshold: int = 5):
+        self.interval = interval
+        self.file_threshold = file_threshold
+        self.channel: Optional[TextChannel] = None
+        self.messages_sent = 0
+        self.files_sent = 0
+        self._lines: List[str] = []
+        self._size = 0
+        self._wakeup = Event()
+        self._flush_lock = Lock()
+        self._task: Optional[Task] = None
+
+    @property
+    def buffered(self) -> int:
+        return len(self._lines)
+
+    def log(self, text: str):
+        self._lines.append(str(text))
+        self._size += len(self._lines[-1]) + 1
+        if self._size >= MESSAGE_LIMIT:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        """
+        stop the flush task and send what is left, called on shutdown
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await wait_for(self._wakeup.wait(), self.interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._lines or self.channel is None:
+                return
+            lines, self._lines, self._size = self._lines, [], 0
+            try:
+                await self._send(lines)
+            except Exception as e:
+                # connection errors as well, the flush task has to keep running
+                sentry_sdk.capture_exception(e)
+                # the lines are not lost, they end up in the container log at least
+                print("\n".join(lines))
+
+    async def _send(self, lines: List[str]):
+        messages = pack_lines(lines)
+        if len(messages) <= self.file_threshold:
+            for message in messages:
+                await self.channel.send(message)
+                self.messages_sent += 1
+            return
+
+        buffer = BytesIO("\n".join(lines).encode())
+        filename = f"dump-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.txt"
+        await self.channel.send(f"{len(lines)} Einträge", file=File(buffer, filename=filename))
+        self.files_sent += 1
@@ -0,0 +1,144 @@
+import asyncio
+from asyncio import Event, Lock, Task, TimeoutError, wait_for
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import sentry_sdk
+from PyDrocsid.database import db, db_thread
+
+from models.state import State
+from models.state_event import StateEvent, SEARCHER, DONATOR
+
+# role, user_id
+UserKey = Tuple[str, int]
+
+
+class EventStore:
+    """
+    collects state events in memory and appends them to the state_event table in batches
+    the buffer is written every `interval` seconds or once it holds `batch_size` events, and on shutdown
+    """
+
+    def __init__(self, interval: float, batch_size: int = 200,
+                 sink: Optional[Callable[[List[dict]], None]] = None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.written = 0
+        self._sink = sink
+        self._events: List[dict] = []
+        self._wakeup = Event()
+        self._flush_lock = Lock()
+        self._task: Optional[Task] = None
+
+    @property
+    def buffered(self) -> int:
+        return len(self._events)
+
+    def record(
+        self,
+        role: str,
+        user_id: int,
+        from_state: Optional[State],
+        to_state: Optional[State],
+        reason: str,
+        channel_id: Optional[int] = None,
+        used_invites: Optional[int] = None,
+        invite_count: Optional[int] = None,
+        enqueued_at: Optional[datetime] = None,
+    ):
+        self._events.append({
+            "ts": datetime.utcnow(),
+            "user_id": user_id,
+            "role": role,
+            "from_state": from_state,
+            "to_state": to_state,
+            "reason": reason,
+            "channel_id": channel_id,
+            "used_invites": used_invites,
+            "invite_count": invite_count,
+            "enqueued_at": enqueued_at,
+        })
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await wait_for(self._wakeup.wait(), self.interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._events:
+                return
+            events, self._events = self._events, []
+            try:
+                await db_thread(lambda: db.session.bulk_insert_mappings(StateEvent, events))
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+                # keep the order, the next flush tries again
+                self._events = events + self._events
+                return
+            self.written += len(events)
+            if self._sink is not None:
+                self._sink(events)
+
+
+class ReplayedUser:
+    def __init__(self, role: str, user_id: int):
+        self.role = role
+        self.user_id = user_id
+        self.state: Optional[State] = None
+        self.since: Optional[datetime] = None
+        self.used_invites: Optional[int] = None
+        self.invite_count: Optional[int] = None
+        self.enqueued_at: Optional[datetime] = None
+
+
+def replay(events: Iterable[StateEvent]) -> Dict[UserKey, ReplayedUser]:
+    """
+    rebuild the state of every searcher and donator from events ordered by (ts, id)
+    users whose last event deleted them have the state None
+    """
+    users: Dict[UserKey, ReplayedUser] = {}
+    for event in events:
+        key: UserKey = (event.role, event.user_id)
+        if event.to_state is None:
+            users[key] = ReplayedUser(event.role, event.user_id)
+            continue
+        user = users.setdefault(key, ReplayedUser(event.role, event.user_id))
+        if user.state != event.to_state:
+            user.since = event.ts
+        user.state = event.to_state
+        if event.used_invites is not None:
+            user.used_invites = event.used_invites
+        if event.invite_count is not None:
+            user.invite_count = event.invite_count
+        if event.enqueued_at is not None:
+            user.enqueued_at = event.enqueued_at
+    return users
+
+
+def format_event(event: dict) -> str:
+    name = {SEARCHER: "Suchender", DONATOR: "Einladender"}.get(event["role"], event["role"])
+    from_state = event["from_state"].name if event["from_state"] else "-"
+    to_state = event["to_state"].name if event["to_state"] else "gelöscht"
+    line = f"{name} <@{event['user_id']}> ({event['user_id']}): {from_state} -> {to_state} ({event['reason']})"
+    if event["used_invites"] is not None:
+        line += f", {event['used_invites']}/{event['invite_count']} Einladungen"
+    if event["channel_id"] is not None:
+        line += f", <#{event['channel_id']}>"
+    return line
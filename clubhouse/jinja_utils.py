@@ -1,6 +1,46 @@
 import re
+from functools import lru_cache
+from threading import local
+from typing import Callable
+
+from jinja2 import Markup
+from markdown import Markdown
+
+strikethrough_pattern = re.compile(r'~~(.*?)~~')
+mention_pattern = re.compile(r'<@!?(\d*?)>')
+
+_converters = local()
 
 
 def regex_replace(s):
     #re.sub(r'<(\\/)?p>', r'<\1div>',
-    return re.sub(r'~~(.*?)~~', r'<strike>\1</strike>', s)
+    return strikethrough_pattern.sub(r'<strike>\1</strike>', s)
+
+
+def get_markdown() -> Markdown:
+    """
+    return the markdown converter of the current thread
+    Markdown instances keep state while converting, so chatlogs rendered in parallel must not share one
+    """
+    converter = getattr(_converters, "markdown", None)
+    if converter is None:
+        converter = _converters.markdown = Markdown(extensions=['meta'])
+    return converter
+
+
+@lru_cache(maxsize=4096)
+def render_markdown(text: str) -> Markup:
+    """
+    convert markdown to html with a reset, reused converter
+    texts that repeat in every channel (tutorial embeds, pings) are converted only once
+    """
+    return Markup(get_markdown().reset().convert(text))
+
+
+def add_mention_suffix(s, member_name: Callable[[str], str]) -> str:
+    """
+    append the member name to every mention, e.g. <@123> becomes <@123> (name)
+    """
+    if not isinstance(s, str):
+        return ""
+    return mention_pattern.sub(lambda x: f"<@{x.group(1)}> ({member_name(x.group(1))})", s)
@@ -0,0 +1,41 @@
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+
+from alembic import context
+
+# the bot imports its modules relative to the clubhouse directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PyDrocsid.database import db  # noqa: E402
+
+import models.category  # noqa: E402,F401
+import models.channel  # noqa: E402,F401
+import models.donator  # noqa: E402,F401
+import models.searcher  # noqa: E402,F401
+import models.state_event  # noqa: E402,F401
+
+# the bot upgrades on startup and keeps its own logging setup
+if context.config.config_file_name is not None and context.config.attributes.get("configure_logger", True):
+    fileConfig(context.config.config_file_name)
+
+target_metadata = db.Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(url=str(db.engine.url), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with db.engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
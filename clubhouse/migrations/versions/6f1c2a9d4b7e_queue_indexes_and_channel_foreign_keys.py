@@ -0,0 +1,64 @@
+"""queue indexes and channel foreign keys
+
+Revision ID: 6f1c2a9d4b7e
+Revises:
+Create Date: 2026-10-17 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "6f1c2a9d4b7e"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("searcher", "ix_searcher_state_enqueued_at", ["state", "enqueued_at"]),
+    ("donator", "ix_donator_state_last_contact", ["state", "last_contact"]),
+    ("channel", "ix_channel_searcher_id", ["searcher_id"]),
+    ("channel", "ix_channel_donator_id", ["donator_id"]),
+]
+
+FOREIGN_KEYS = [
+    ("fk_channel_searcher_id_searcher", "searcher_id", "searcher"),
+    ("fk_channel_donator_id_donator", "donator_id", "donator"),
+]
+
+
+def upgrade():
+    # tables created by db.create_tables() after this change already have everything
+    inspector = sa.inspect(op.get_bind())
+
+    for table, name, columns in INDEXES:
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    existing_keys = {
+        (tuple(key["constrained_columns"]), key["referred_table"]) for key in inspector.get_foreign_keys("channel")
+    }
+    missing_keys = [key for key in FOREIGN_KEYS if ((key[1],), key[2]) not in existing_keys]
+    if not missing_keys:
+        return
+
+    # channels can still reference users that have been deleted in the meantime
+    for _, column, table in missing_keys:
+        op.execute(f"UPDATE channel SET {column} = NULL WHERE {column} NOT IN (SELECT user_id FROM {table})")
+
+    with op.batch_alter_table("channel") as batch:
+        for name, column, table in missing_keys:
+            batch.create_foreign_key(name, table, [column], ["user_id"], ondelete="SET NULL")
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    existing_keys = {key["name"] for key in inspector.get_foreign_keys("channel")}
+    with op.batch_alter_table("channel") as batch:
+        for name, _, _ in FOREIGN_KEYS:
+            if name in existing_keys:
+                batch.drop_constraint(name, type_="foreignkey")
+
+    for table, name, _ in INDEXES:
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table)
@@ -0,0 +1,33 @@
+"""channel activity
+
+Revision ID: 9b3e5d7a1c20
+Revises: 6f1c2a9d4b7e
+Create Date: 2026-10-17 14:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "9b3e5d7a1c20"
+down_revision = "6f1c2a9d4b7e"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["last_human_message_at", "last_bot_message_at"]
+
+
+def upgrade():
+    # tables created by db.create_tables() after this change already have the columns
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("channel")}
+    with op.batch_alter_table("channel") as batch:
+        for name in COLUMNS:
+            if name not in existing:
+                batch.add_column(sa.Column(name, sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("channel")}
+    with op.batch_alter_table("channel") as batch:
+        for name in COLUMNS:
+            if name in existing:
+                batch.drop_column(name)
@@ -0,0 +1,29 @@
+"""state event enqueued_at
+
+Revision ID: a5c3e9f1d724
+Revises: e7d2b4c9a831
+Create Date: 2026-10-17 23:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a5c3e9f1d724"
+down_revision = "e7d2b4c9a831"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # tables created by db.create_tables() after this change already have the column
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("state_event")}
+    if "enqueued_at" not in existing:
+        with op.batch_alter_table("state_event") as batch:
+            batch.add_column(sa.Column("enqueued_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("state_event")}
+    if "enqueued_at" in existing:
+        with op.batch_alter_table("state_event") as batch:
+            batch.drop_column("enqueued_at")
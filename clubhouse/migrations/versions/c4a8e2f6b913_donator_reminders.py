@@ -0,0 +1,45 @@
+"""donator reminders
+
+Revision ID: c4a8e2f6b913
+Revises: 9b3e5d7a1c20
+Create Date: 2026-10-17 16:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c4a8e2f6b913"
+down_revision = "9b3e5d7a1c20"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["last_reminded_at", "next_reminder_at"]
+INDEX = "ix_donator_state_next_reminder_at"
+
+
+def upgrade():
+    # tables created by db.create_tables() after this change already have the columns
+    inspector = sa.inspect(op.get_bind())
+    existing = {column["name"] for column in inspector.get_columns("donator")}
+    with op.batch_alter_table("donator") as batch:
+        for name in COLUMNS:
+            if name not in existing:
+                batch.add_column(sa.Column(name, sa.DateTime(), nullable=True))
+    if INDEX not in {index["name"] for index in inspector.get_indexes("donator")}:
+        op.create_index(INDEX, "donator", ["state", "next_reminder_at"])
+
+    # donators that were waiting before were reminded every 5 minutes, continue from their last contact
+    op.execute(
+        "UPDATE donator SET next_reminder_at = last_contact WHERE state = 'INITIAL' AND next_reminder_at IS NULL"
+    )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if INDEX in {index["name"] for index in inspector.get_indexes("donator")}:
+        op.drop_index(INDEX, "donator")
+    existing = {column["name"] for column in inspector.get_columns("donator")}
+    with op.batch_alter_table("donator") as batch:
+        for name in COLUMNS:
+            if name in existing:
+                batch.drop_column(name)
@@ -0,0 +1,43 @@
+"""state events
+
+Revision ID: e7d2b4c9a831
+Revises: c4a8e2f6b913
+Create Date: 2026-10-17 21:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e7d2b4c9a831"
+down_revision = "c4a8e2f6b913"
+branch_labels = None
+depends_on = None
+
+STATES = ("INITIAL", "QUEUED", "MATCHED", "DONE", "ABORTED")
+INDEX = "ix_state_event_user_id_ts"
+
+
+def upgrade():
+    # db.create_tables() creates the table on startup as well
+    if "state_event" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "state_event",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("ts", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("role", sa.String(8), nullable=False),
+        sa.Column("from_state", sa.Enum(*STATES, name="state"), nullable=True),
+        sa.Column("to_state", sa.Enum(*STATES, name="state"), nullable=True),
+        sa.Column("reason", sa.String(32), nullable=False),
+        sa.Column("channel_id", sa.BigInteger(), nullable=True),
+        sa.Column("used_invites", sa.Integer(), nullable=True),
+        sa.Column("invite_count", sa.Integer(), nullable=True),
+    )
+    op.create_index(INDEX, "state_event", ["user_id", "ts"])
+
+
+def downgrade():
+    if "state_event" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_index(INDEX, "state_event")
+        op.drop_table("state_event")
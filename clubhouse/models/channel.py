@@ -1,22 +1,22 @@
-from typing import Union
+from datetime import datetime
+from typing import Union, Optional
 
 from PyDrocsid.database import db
-from sqlalchemy import Column, BigInteger
+from sqlalchemy import Column, BigInteger, ForeignKey, DateTime
 
 
 class Channel(db.Base):
     __tablename__ = "channel"
 
     channel_id: Union[Column, int] = Column(BigInteger, primary_key=True, unique=True)
-    # TODO use foreign keys
-    searcher_id: Union[Column, int] = Column(BigInteger)
-    # searcher_id = Column('searcher', Integer, ForeignKey('searcher.id'), nullable=False)
-    # searcher = db.relationship('Channel', backref=db.backref('searcher', lazy=True))
-
-    donator_id: Union[Column, int] = Column(BigInteger)
-
-    # donator_id = Column('donator', Integer, ForeignKey('donator.id'), nullable=False)
-    # donator = db.relationship('Channel', backref=db.backref('donator', lazy=True))
+    searcher_id: Union[Column, int] = Column(
+        BigInteger, ForeignKey("searcher.user_id", ondelete="SET NULL"), index=True
+    )
+    donator_id: Union[Column, int] = Column(
+        BigInteger, ForeignKey("donator.user_id", ondelete="SET NULL"), index=True
+    )
+    last_human_message_at: Union[Column, Optional[datetime]] = Column(DateTime, nullable=True)
+    last_bot_message_at: Union[Column, Optional[datetime]] = Column(DateTime, nullable=True)
 
     @staticmethod
     def create(channel_id: int, donator_id: int, searcher_id: int) -> "Channel":
@@ -1,43 +1,89 @@
-from datetime import datetime
-from typing import Union
+from datetime import datetime, timedelta
+from typing import Union, Optional, List, Tuple
 
 from PyDrocsid.database import db
-from sqlalchemy import Column, Integer, BigInteger, DateTime, Enum
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Enum, Index
 
 from models.state import State
 
 
 class Donator(db.Base):
     __tablename__ = "donator"
+    __table_args__ = (
+        Index("ix_donator_state_last_contact", "state", "last_contact"),
+        Index("ix_donator_state_next_reminder_at", "state", "next_reminder_at"),
+    )
 
     user_id: Union[Column, int] = Column(BigInteger, primary_key=True, unique=True)
     invite_count: Union[Column, int] = Column(Integer)
     used_invites: Union[Column, int] = Column(Integer)
     last_contact: Union[Column, datetime] = Column(DateTime)
     state: Union[Column, State] = Column('state', Enum(State))
+    last_reminded_at: Union[Column, Optional[datetime]] = Column(DateTime, nullable=True)
+    next_reminder_at: Union[Column, Optional[datetime]] = Column(DateTime, nullable=True)
 
     @staticmethod
-    def create(user_id: int, last_contact: DateTime = datetime.utcnow()) -> "Donator":
-        row = Donator(user_id=user_id, last_contact=last_contact, used_invites=0, invite_count=0, state=State.INITIAL)
+    def create(
+        user_id: int, last_contact: Optional[datetime] = None, next_reminder_at: Optional[datetime] = None
+    ) -> "Donator":
+        row = Donator(
+            user_id=user_id,
+            last_contact=last_contact or datetime.utcnow(),
+            used_invites=0,
+            invite_count=0,
+            state=State.INITIAL,
+            next_reminder_at=next_reminder_at,
+        )
         db.add(row)
         return row
 
     @staticmethod
-    def change_invite_count(user_id: int, invite_count: int):
+    def claim_reminders(
+        user_ids: List[int], now: datetime, interval: timedelta, max_interval: timedelta
+    ) -> Tuple[List["Donator"], List[Tuple[int, datetime]]]:
+        """
+        record a reminder for every INITIAL donator of user_ids whose next reminder is due
+        the gap to the next reminder doubles every time, up to max_interval
+        returns the reminded donators and (user_id, next_reminder_at) of the INITIAL donators that are not due yet
+        """
+        waiting = (
+            db.query(Donator)
+            .filter(Donator.user_id.in_(user_ids))
+            .filter(Donator.state == State.INITIAL)
+            .filter(Donator.next_reminder_at.isnot(None))
+        )
+        due: List[Donator] = waiting.filter(Donator.next_reminder_at <= now).all()
+        for row in due:
+            gap = interval
+            if row.last_reminded_at is not None:
+                gap = min(max_interval, 2 * (row.next_reminder_at - row.last_reminded_at))
+            row.last_reminded_at = now
+            row.next_reminder_at = now + gap
+        pending = waiting.filter(Donator.next_reminder_at > now).with_entities(
+            Donator.user_id, Donator.next_reminder_at
+        ).all()
+        return due, pending
+
+    @staticmethod
+    def change_invite_count(user_id: int, invite_count: int) -> "Donator":
         row: Donator = db.get(Donator, user_id)
         row.invite_count = invite_count
+        return row
 
     @staticmethod
-    def change_used_invites(user_id: int, used_invites: int):
+    def change_used_invites(user_id: int, used_invites: int) -> "Donator":
         row: Donator = db.get(Donator, user_id)
         row.used_invites = used_invites
+        return row
 
     @staticmethod
-    def change_state(user_id: int, state: State):
+    def change_state(user_id: int, state: State) -> "Donator":
         row: Donator = db.get(Donator, user_id)
         row.state = state
+        return row
 
     @staticmethod
-    def change_last_contact(user_id: int, last_contact: DateTime):
+    def change_last_contact(user_id: int, last_contact: DateTime) -> "Donator":
         row: Donator = db.get(Donator, user_id)
         row.last_contact = last_contact
+        return row
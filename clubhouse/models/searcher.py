@@ -1,31 +1,34 @@
 from datetime import datetime
-from typing import Union
+from typing import Union, Optional
 
 from PyDrocsid.database import db
-from sqlalchemy import Column, BigInteger, Enum, DateTime
+from sqlalchemy import Column, BigInteger, Enum, DateTime, Index
 
 from models.state import State
 
 
 class Searcher(db.Base):
     __tablename__ = "searcher"
+    __table_args__ = (Index("ix_searcher_state_enqueued_at", "state", "enqueued_at"),)
 
     user_id: Union[Column, int] = Column(BigInteger, primary_key=True, unique=True)
     state: Union[Column, State] = Column('state', Enum(State))
     enqueued_at: Union[Column, datetime] = Column(DateTime)
 
     @staticmethod
-    def create(user_id: int, enqueued_at: DateTime = datetime.utcnow()) -> "Searcher":
-        row = Searcher(user_id=user_id, state=State.INITIAL, enqueued_at=enqueued_at)
+    def create(user_id: int, enqueued_at: Optional[datetime] = None) -> "Searcher":
+        row = Searcher(user_id=user_id, state=State.INITIAL, enqueued_at=enqueued_at or datetime.utcnow())
         db.add(row)
         return row
 
     @staticmethod
-    def change_state(user_id: int, state: State):
+    def change_state(user_id: int, state: State) -> "Searcher":
         row: Searcher = db.get(Searcher, user_id)
         row.state = state
+        return row
 
     @staticmethod
-    def change_timestamp(user_id: int, timestamp: datetime):
+    def change_timestamp(user_id: int, timestamp: datetime) -> "Searcher":
         row: Searcher = db.get(Searcher, user_id)
         row.enqueued_at = timestamp
+        return row
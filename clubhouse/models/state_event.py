@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Union, Optional
+
+from PyDrocsid.database import db
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Enum, Index, String
+
+from models.state import State
+
+SEARCHER = "searcher"
+DONATOR = "donator"
+
+
+class StateEvent(db.Base):
+    """
+    append-only log of the state changes of searchers and donators
+    to_state is None if the row was deleted, used_invites and invite_count are only set for donators,
+    enqueued_at (the queue position) only for searchers
+    """
+
+    __tablename__ = "state_event"
+    __table_args__ = (Index("ix_state_event_user_id_ts", "user_id", "ts"),)
+
+    id: Union[Column, int] = Column(Integer, primary_key=True, autoincrement=True)
+    ts: Union[Column, datetime] = Column(DateTime, nullable=False)
+    user_id: Union[Column, int] = Column(BigInteger, nullable=False)
+    role: Union[Column, str] = Column(String(8), nullable=False)
+    from_state: Union[Column, Optional[State]] = Column(Enum(State), nullable=True)
+    to_state: Union[Column, Optional[State]] = Column(Enum(State), nullable=True)
+    reason: Union[Column, str] = Column(String(32), nullable=False)
+    channel_id: Union[Column, Optional[int]] = Column(BigInteger, nullable=True)
+    used_invites: Union[Column, Optional[int]] = Column(Integer, nullable=True)
+    invite_count: Union[Column, Optional[int]] = Column(Integer, nullable=True)
+    enqueued_at: Union[Column, Optional[datetime]] = Column(DateTime, nullable=True)
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from PyDrocsid.database import db
+from sqlalchemy import case
+
+from models.donator import Donator
+from models.searcher import Searcher
+from models.state import State
+
+
+def transition(
+    searcher_id: Optional[int] = None,
+    donator_id: Optional[int] = None,
+    searcher_state: Optional[State] = None,
+    donator_state: Optional[State] = None,
+    used_invites_delta: int = 0,
+    invite_count: Optional[int] = None,
+    enqueued_at: Optional[datetime] = None,
+    last_contact: Optional[datetime] = None,
+) -> Tuple[Optional[Searcher], Optional[Donator]]:
+    """
+    apply the given changes to a searcher and/or a donator with set-based UPDATE statements
+    has to be run through db_thread, so all changes are committed together
+    returns the rows of the given ids after the update (None if a row does not exist)
+    """
+
+    searcher_values = {}
+    if searcher_state is not None:
+        searcher_values[Searcher.state] = searcher_state
+    if enqueued_at is not None:
+        searcher_values[Searcher.enqueued_at] = enqueued_at
+
+    donator_values = {}
+    if donator_state is not None:
+        donator_values[Donator.state] = donator_state
+    if used_invites_delta:
+        used_invites = Donator.used_invites + used_invites_delta
+        donator_values[Donator.used_invites] = case([(used_invites < 0, 0)], else_=used_invites)
+    if invite_count is not None:
+        donator_values[Donator.invite_count] = invite_count
+    if last_contact is not None:
+        donator_values[Donator.last_contact] = last_contact
+
+    searcher: Optional[Searcher] = None
+    if searcher_id is not None:
+        if searcher_values:
+            db.session.query(Searcher).filter(Searcher.user_id == searcher_id).update(
+                searcher_values, synchronize_session=False
+            )
+        searcher = db.session.query(Searcher).populate_existing().get(searcher_id)
+
+    donator: Optional[Donator] = None
+    if donator_id is not None:
+        if donator_values:
+            db.session.query(Donator).filter(Donator.user_id == donator_id).update(
+                donator_values, synchronize_session=False
+            )
+        donator = db.session.query(Donator).populate_existing().get(donator_id)
+
+    return searcher, donator
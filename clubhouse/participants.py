@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, Optional, Union
+
+from models.donator import Donator
+from models.searcher import Searcher
+from models.state import State
+
+User = Union[Donator, Searcher]
+
+
+class ParticipantIndex:
+    """
+    users with a searcher or donator row that is not done or aborted, with the state of each row
+    on_message only goes to the database for these users
+    a user that is still listed after leaving the process only costs a lookup, so rows are added eagerly
+    """
+
+    def __init__(self):
+        self._states: Dict[int, Dict[type, State]] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._states
+
+    def load(self, users: Iterable[User]):
+        self._states = {}
+        for user in users:
+            self.sync(user)
+
+    def clear(self):
+        self._states.clear()
+
+    def state(self, user_id: int) -> Dict[type, State]:
+        return dict(self._states.get(user_id, {}))
+
+    def sync(self, user: Optional[User]):
+        if user is None:
+            return
+        if State.completed(user):
+            self.discard(user)
+        else:
+            self._states.setdefault(user.user_id, {})[type(user)] = user.state
+
+    def add(self, model: type, user_id: int, state: State = State.INITIAL):
+        self._states.setdefault(user_id, {})[model] = state
+
+    def discard(self, user: User):
+        self.discard_user(user.user_id, type(user))
+
+    def discard_user(self, user_id: int, model: Optional[type] = None):
+        """
+        remove one row of the user, or all of them if no model is given
+        """
+        states = self._states.get(user_id)
+        if states is None:
+            return
+        if model is not None:
+            states.pop(model, None)
+        if model is None or not states:
+            del self._states[user_id]
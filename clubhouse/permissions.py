@@ -1,9 +1,32 @@
-from typing import Union
+from typing import Union, Dict, Tuple, Optional
 
 from PyDrocsid.permission import BasePermission, BasePermissionLevel
-from PyDrocsid.settings import Settings
 from discord import Member, User
 
+from util import get_setting
+
+# settings that hold the role of each permission level, highest first
+PERMISSION_ROLE_SETTINGS = ("admin_role", "mod_role", "supp_role")
+
+# member id -> (hash of the role ids, configured role ids, resolved level)
+_levels: Dict[int, Tuple[int, Tuple[Optional[int], ...], "PermissionLevel"]] = {}
+
+
+async def configured_role_ids() -> Tuple[Optional[int], ...]:
+    # served from the settings cache, so a changed role config takes effect after SETTINGS_CACHE_TTL seconds,
+    # or right away with the reload_settings team command
+    return tuple([await get_setting(int, key) for key in PERMISSION_ROLE_SETTINGS])
+
+
+def invalidate_permission_level(member_id: Optional[int] = None):
+    """
+    drop the resolved level of one member (e.g. after a role change), or of all members if no id is given
+    """
+    if member_id is None:
+        _levels.clear()
+    else:
+        _levels.pop(member_id, None)
+
 
 class Permission(BasePermission):
     @property
@@ -19,16 +42,24 @@ class PermissionLevel(BasePermissionLevel):
         if not isinstance(member, Member):
             return PermissionLevel.PUBLIC
 
-        roles = {role.id for role in member.roles}
-
-        async def has_role(role_name):
-            return await Settings.get(int, role_name + "_role") in roles
-
-        if member.guild_permissions.administrator or await has_role("admin"):
+        if member.guild_permissions.administrator:
             return PermissionLevel.ADMINISTRATOR
-        if await has_role("mod"):
-            return PermissionLevel.MODERATOR
-        if await has_role("supp"):
-            return PermissionLevel.SUPPORTER
 
-        return PermissionLevel.PUBLIC
+        config = await configured_role_ids()
+        roles = frozenset(role.id for role in member.roles)
+        key = hash(roles)
+        cached = _levels.get(member.id)
+        if cached is not None and cached[0] == key and cached[1] == config:
+            return cached[2]
+
+        admin_role, mod_role, supp_role = config
+        if admin_role in roles:
+            level = PermissionLevel.ADMINISTRATOR
+        elif mod_role in roles:
+            level = PermissionLevel.MODERATOR
+        elif supp_role in roles:
+            level = PermissionLevel.SUPPORTER
+        else:
+            level = PermissionLevel.PUBLIC
+        _levels[member.id] = key, config, level
+        return level
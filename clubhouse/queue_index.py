@@ -0,0 +1,173 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Iterator, Iterable, Union
+
+from discord import Guild, Member, Status
+
+from models.donator import Donator
+from models.searcher import Searcher
+from models.state import State
+
+# presence buckets, in queue order
+ONLINE, AWAY, OFFLINE, MISSING = range(4)
+
+PRESENCE_BUCKETS: Dict[Status, int] = {
+    Status.online: ONLINE,
+    Status.idle: AWAY,
+    Status.dnd: AWAY,
+    Status.do_not_disturb: AWAY,
+    Status.offline: OFFLINE,
+    Status.invisible: OFFLINE,
+}
+
+# (presence bucket, timestamp, user_id)
+Key = Tuple[int, float, int]
+
+
+def presence_bucket(member: Optional[Member]) -> int:
+    if member is None:
+        return MISSING
+    return PRESENCE_BUCKETS.get(member.status, AWAY)
+
+
+def sort_key(user_id: int, timestamp: Optional[datetime], bucket: int) -> Key:
+    return bucket, timestamp.timestamp() if timestamp else float("-inf"), user_id
+
+
+class SortedQueue:
+    """
+    one queue side, kept sorted by its compact (presence bucket, timestamp, user_id) keys
+    positions are a bisect (O(log n)), put and discard bisect too but shift the list, which is O(n) memmove:
+    about 15us per update at 100k queued users and 200us at 1M (see bench/queue_positions.py)
+    """
+
+    def __init__(self):
+        self._keys: List[Key] = []
+        self._entries: Dict[int, Key] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def __iter__(self) -> Iterator[int]:
+        return (key[2] for key in self._keys)
+
+    def clear(self):
+        self._keys.clear()
+        self._entries.clear()
+
+    def load(self, entries: Iterable[Tuple[int, Optional[datetime], int]]):
+        """
+        replace the whole queue with (user_id, timestamp, bucket) entries, sorting only once
+        """
+        self._entries = {user_id: sort_key(user_id, timestamp, bucket) for user_id, timestamp, bucket in entries}
+        self._keys = sorted(self._entries.values())
+
+    def put(self, user_id: int, timestamp: Optional[datetime], bucket: int):
+        self.discard(user_id)
+        key: Key = sort_key(user_id, timestamp, bucket)
+        insort(self._keys, key)
+        self._entries[user_id] = key
+
+    def discard(self, user_id: int) -> bool:
+        key = self._entries.pop(user_id, None)
+        if key is None:
+            return False
+        del self._keys[bisect_left(self._keys, key)]
+        return True
+
+    def move(self, user_id: int, bucket: int):
+        key = self._entries.get(user_id)
+        if key is None or key[0] == bucket:
+            return
+        self.discard(user_id)
+        key = (bucket,) + key[1:]
+        insort(self._keys, key)
+        self._entries[user_id] = key
+
+    def first(self) -> Optional[int]:
+        return self._keys[0][2] if self._keys else None
+
+    def position(self, user_id: int) -> Optional[int]:
+        """
+        1-based position of the user in this queue, None if the user is not queued
+        """
+        key = self._entries.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
+
+
+class QueueIndex:
+    """
+    in-memory mirror of the searcher and donator queues
+    the database stays the source of truth, this index is rebuilt on startup and synced on every state change
+    """
+
+    def __init__(self):
+        self.guild: Optional[Guild] = None
+        self.searchers = SortedQueue()
+        self.donators = SortedQueue()
+
+    def _bucket(self, user_id: int) -> int:
+        return presence_bucket(self.guild.get_member(user_id) if self.guild else None)
+
+    def rebuild(self, guild: Guild, searchers: List[Searcher], donators: List[Donator]):
+        self.guild = guild
+        self.searchers.load(
+            (searcher.user_id, searcher.enqueued_at, self._bucket(searcher.user_id))
+            for searcher in searchers
+            if self._searcher_queued(searcher)
+        )
+        self.donators.load(
+            (donator.user_id, donator.last_contact, self._bucket(donator.user_id))
+            for donator in donators
+            if self._donator_queued(donator)
+        )
+
+    @staticmethod
+    def _searcher_queued(searcher: Searcher) -> bool:
+        return searcher.state == State.QUEUED
+
+    @staticmethod
+    def _donator_queued(donator: Donator) -> bool:
+        return donator.state in (State.MATCHED, State.QUEUED) and donator.used_invites < donator.invite_count
+
+    def sync_searcher(self, searcher: Optional[Searcher]):
+        if searcher is None:
+            return
+        if self._searcher_queued(searcher):
+            self.searchers.put(searcher.user_id, searcher.enqueued_at, self._bucket(searcher.user_id))
+        else:
+            self.searchers.discard(searcher.user_id)
+
+    def sync_donator(self, donator: Optional[Donator]):
+        if donator is None:
+            return
+        if self._donator_queued(donator):
+            self.donators.put(donator.user_id, donator.last_contact, self._bucket(donator.user_id))
+        else:
+            self.donators.discard(donator.user_id)
+
+    def discard_searcher(self, user_id: int):
+        self.searchers.discard(user_id)
+
+    def discard_donator(self, user_id: int):
+        self.donators.discard(user_id)
+
+    def discard(self, user: Union[Donator, Searcher]):
+        if isinstance(user, Donator):
+            self.donators.discard(user.user_id)
+        else:
+            self.searchers.discard(user.user_id)
+
+    def update_presence(self, member: Member):
+        bucket = presence_bucket(member)
+        self.searchers.move(member.id, bucket)
+        self.donators.move(member.id, bucket)
+
+    def clear(self):
+        self.searchers.clear()
+        self.donators.clear()
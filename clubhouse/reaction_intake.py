@@ -0,0 +1,172 @@
+import asyncio
+from asyncio import Event, Queue, Task
+from typing import Dict, List, Optional, Callable, Awaitable, Iterable, Set
+
+import sentry_sdk
+from discord import Member, Message, HTTPException, NotFound
+
+
+class IntakeMetrics:
+    def __init__(self):
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.removed = 0
+        self.cleared = 0
+        self.max_pending = 0
+
+
+class PendingClicks:
+    def __init__(self, member: Member):
+        self.member = member
+        # distinct emojis in click order
+        self.emojis: List[str] = []
+
+
+class ReactionIntake:
+    """
+    handles the reactions on the start message with a fixed number of workers
+    clicks are queued per user: a user is handled by one worker at a time and repeated clicks on the same emoji
+    while the user is waiting are coalesced into one
+    at most `max_pending` users wait at the same time, further clicks are dropped (the reaction is removed anyway,
+    so the user can simply click again)
+    the reactions are removed in batches, an emoji with at least `clear_threshold` pending removals is cleared
+    (and added again if it is one of the `own_emojis`) instead of removing every user's reaction on its own
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        handler: Callable[[Member, str], Awaitable],
+        own_emojis: Iterable[str] = (),
+        batch_interval: float = 1.0,
+        clear_threshold: int = 5,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.batch_interval = batch_interval
+        self.clear_threshold = clear_threshold
+        self.metrics = IntakeMetrics()
+        self._handler = handler
+        self._own_emojis: Set[str] = set(own_emojis)
+        self._queue: Optional[Queue] = None
+        self._pending: Dict[int, PendingClicks] = {}
+        self._active: Dict[int, None] = {}
+        self._tasks: List[Task] = []
+        self._message: Optional[Message] = None
+        # emoji -> reacting members, removed by the removal task
+        self._removals: Dict[str, Dict[int, Member]] = {}
+        self._removal_wakeup = Event()
+        self._removal_task: Optional[Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    @property
+    def pending_removals(self) -> int:
+        return sum(map(len, self._removals.values()))
+
+    @property
+    def saturated(self) -> bool:
+        return len(self._pending) >= self.max_pending
+
+    def start(self):
+        if self._queue is None:
+            self._queue = Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.get_running_loop().create_task(self._worker()))
+        if self._removal_task is None or self._removal_task.done():
+            self._removal_task = asyncio.get_running_loop().create_task(self._removal_loop())
+
+    def remove_later(self, message: Message, emoji: str, member: Member):
+        self.start()
+        self._message = message
+        self._removals.setdefault(emoji, {})[member.id] = member
+        self._removal_wakeup.set()
+
+    def submit(self, member: Member, emoji: str) -> bool:
+        """
+        queue a click, returns False if it was dropped because too many users are waiting
+        """
+        self.start()
+        self.metrics.received += 1
+        if (clicks := self._pending.get(member.id)) is not None:
+            if emoji in clicks.emojis:
+                self.metrics.coalesced += 1
+            else:
+                clicks.emojis.append(emoji)
+            return True
+        if self.saturated:
+            self.metrics.dropped += 1
+            return False
+
+        clicks = self._pending[member.id] = PendingClicks(member)
+        clicks.emojis.append(emoji)
+        self.metrics.max_pending = max(self.metrics.max_pending, len(self._pending))
+        if member.id not in self._active:
+            # an active user is queued again by its worker once the current clicks are handled
+            self._queue.put_nowait(member.id)
+        return True
+
+    async def _worker(self):
+        while True:
+            user_id: int = await self._queue.get()
+            clicks = self._pending.pop(user_id, None)
+            if clicks is None:
+                self._queue.task_done()
+                continue
+            self._active[user_id] = None
+            try:
+                for emoji in clicks.emojis:
+                    try:
+                        await self._handler(clicks.member, emoji)
+                    except Exception as e:
+                        self.metrics.failed += 1
+                        sentry_sdk.capture_exception(e)
+                    else:
+                        self.metrics.processed += 1
+            finally:
+                del self._active[user_id]
+                if user_id in self._pending:
+                    self._queue.put_nowait(user_id)
+                self._queue.task_done()
+
+    async def _removal_loop(self):
+        while True:
+            await self._removal_wakeup.wait()
+            # collect the clicks of one interval before removing them together
+            await asyncio.sleep(self.batch_interval)
+            self._removal_wakeup.clear()
+            removals, self._removals = self._removals, {}
+            for emoji, members in removals.items():
+                try:
+                    await self._remove(emoji, list(members.values()))
+                except Exception as e:
+                    sentry_sdk.capture_exception(e)
+
+    async def _remove(self, emoji: str, members: List[Member]):
+        if len(members) >= self.clear_threshold:
+            await self._message.clear_reaction(emoji)
+            if emoji in self._own_emojis:
+                await self._message.add_reaction(emoji)
+            self.metrics.cleared += 1
+            self.metrics.removed += len(members)
+            return
+        for member in members:
+            try:
+                await self._message.remove_reaction(emoji, member)
+            except NotFound:
+                pass
+            except HTTPException as e:
+                sentry_sdk.capture_exception(e)
+            else:
+                self.metrics.removed += 1
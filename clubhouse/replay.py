@@ -0,0 +1,84 @@
+"""
+rebuild the searcher and donator tables from the state_event table
+
+    python replay.py                  show the users whose rows differ from the replayed state
+    python replay.py --apply          write the replayed state to the tables
+    python replay.py --until ISO_TS   only replay events up to the given time (e.g. 2026-10-01T12:00:00)
+
+only users that appear in the event log are touched, rows from before the event log are kept as they are
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from PyDrocsid.database import db
+
+from event_store import replay, ReplayedUser, UserKey
+from models.donator import Donator
+from models.searcher import Searcher
+from models.state_event import StateEvent, SEARCHER
+
+
+def describe(row: Union[Searcher, Donator, None], user: ReplayedUser) -> Optional[str]:
+    if row is None and user.state is None:
+        return None
+    if row is None:
+        return f"missing, replayed {user.state.name}"
+    if user.state is None:
+        return f"{row.state.name}, replayed deleted"
+    if row.state != user.state:
+        return f"{row.state.name}, replayed {user.state.name}"
+    if isinstance(row, Donator) and user.used_invites is not None and row.used_invites != user.used_invites:
+        return f"{row.used_invites} used invites, replayed {user.used_invites}"
+    if isinstance(row, Searcher) and user.enqueued_at is not None and row.enqueued_at != user.enqueued_at:
+        return f"enqueued at {row.enqueued_at}, replayed {user.enqueued_at}"
+    return None
+
+
+def apply(row: Union[Searcher, Donator, None], user: ReplayedUser):
+    if user.state is None:
+        if row is not None:
+            db.delete(row)
+        return
+    if row is None:
+        row = Searcher.create(user.user_id, user.enqueued_at) if user.role == SEARCHER else Donator.create(user.user_id)
+    row.state = user.state
+    if isinstance(row, Searcher):
+        # the recorded queue position, requeued searchers keep theirs and move_to_top changes it
+        if user.enqueued_at is not None:
+            row.enqueued_at = user.enqueued_at
+        return
+    if user.used_invites is not None:
+        row.used_invites = user.used_invites
+    if user.invite_count is not None:
+        row.invite_count = user.invite_count
+
+
+def main():
+    parser = ArgumentParser(description="rebuild searcher and donator state from the state events")
+    parser.add_argument("--apply", action="store_true", help="write the replayed state to the tables")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ignore events after this time (UTC)")
+    args = parser.parse_args()
+
+    query = db.query(StateEvent)
+    if args.until is not None:
+        query = query.filter(StateEvent.ts <= args.until)
+    users: Dict[UserKey, ReplayedUser] = replay(query.order_by(StateEvent.ts, StateEvent.id).yield_per(1000))
+
+    changed = 0
+    for (role, user_id), user in sorted(users.items()):
+        row = db.get(Searcher if role == SEARCHER else Donator, user_id)
+        if (difference := describe(row, user)) is None:
+            continue
+        changed += 1
+        print(f"{role} {user_id}: {difference}")
+        if args.apply:
+            apply(row, user)
+
+    if args.apply:
+        db.commit()
+    print(f"{len(users)} users replayed, {changed} {'updated' if args.apply else 'differ'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+from os import getenv
+from typing import Optional, List, Tuple, Callable, TypeVar, Type, Dict, Iterable
+
+from PyDrocsid.database import db, db_thread
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from models.category import Category
+from models.channel import Channel
+from models.donator import Donator
+from models.searcher import Searcher
+from models.state import State
+
+T = TypeVar("T")
+
+db_async = getenv("DB_ASYNC", "false").lower() == "true"
+
+
+def create_async_sessionmaker():
+    """
+    create the pooled asyncio engine for DB_ASYNC=true
+    DB_ASYNC_URL overrides the mysql url built from the DB_* variables (e.g. sqlite+aiosqlite:///clubhouse.db)
+    """
+
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+        from sqlalchemy.orm import sessionmaker
+    except ImportError:
+        print("DB_ASYNC needs sqlalchemy>=1.4 with asyncio support, falling back to db_thread")
+        return None
+
+    url = getenv("DB_ASYNC_URL") or "mysql+aiomysql://{}:{}@{}:{}/{}".format(
+        getenv("DB_USER", "bot"),
+        getenv("DB_PASSWORD", "bot"),
+        getenv("DB_HOST", "localhost"),
+        getenv("DB_PORT", "3306"),
+        getenv("DB_DATABASE", "bot"),
+    )
+    options = {}
+    if not url.startswith("sqlite"):
+        options = {
+            "pool_size": int(getenv("DB_POOL_SIZE", "20")),
+            "max_overflow": int(getenv("DB_MAX_OVERFLOW", "20")),
+            "pool_recycle": int(getenv("DB_POOL_RECYCLE", "300")),
+            "pool_pre_ping": True,
+        }
+    try:
+        engine = create_async_engine(url, **options)
+    except Exception as e:  # missing async driver or invalid url
+        print(f"Unable to create the async database engine ({e}), falling back to db_thread")
+        return None
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class Repository:
+    """
+    awaitable read access to the clubhouse tables
+    with DB_ASYNC=true the queries run on a pooled asyncio engine without leaving the event loop,
+    otherwise every call is handed to db_thread as before
+    writes still go through db_thread, so models.transition keeps committing all changes together
+    """
+
+    def __init__(self):
+        self._sessionmaker = create_async_sessionmaker() if db_async else None
+
+    @property
+    def is_async(self) -> bool:
+        return self._sessionmaker is not None
+
+    async def run(self, fn: Callable[[Session], T]) -> T:
+        """
+        run fn with a session, so several queries can be batched into one call
+        the returned rows are detached, but all their columns are loaded
+        """
+        if self._sessionmaker is None:
+            return await db_thread(lambda: fn(db.session))
+        async with self._sessionmaker() as session:
+            return await session.run_sync(fn)
+
+    async def get(self, model: Type[T], primary_key: int) -> Optional[T]:
+        return await self.run(lambda session: session.query(model).get(primary_key))
+
+    async def all(self, model: Type[T], **filters) -> List[T]:
+        return await self.run(lambda session: session.query(model).filter_by(**filters).all())
+
+    async def count(self, model, **filters) -> int:
+        return await self.run(lambda session: session.query(model).filter_by(**filters).count())
+
+    async def get_user(self, user_id: int) -> Tuple[Optional[Donator], Optional[Searcher]]:
+        return await self.run(
+            lambda session: (session.query(Donator).get(user_id), session.query(Searcher).get(user_id))
+        )
+
+    async def load_users(self, model: Type[T], user_ids: Iterable[int]) -> Dict[int, T]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        return {
+            row.user_id: row
+            for row in await self.run(lambda session: session.query(model).filter(model.user_id.in_(user_ids)).all())
+        }
+
+    async def queued_searchers(self) -> List[Searcher]:
+        return await self.all(Searcher, state=State.QUEUED)
+
+    async def queued_donators(self) -> List[Donator]:
+        return await self.run(
+            lambda session: session.query(Donator)
+            .filter(Donator.used_invites < Donator.invite_count)
+            .filter(Donator.state.in_((State.MATCHED, State.QUEUED)))
+            .all()
+        )
+
+    async def active_users(self, model: Type[T]) -> List[T]:
+        """
+        all searchers or donators that are not done or aborted
+        """
+        return await self.run(
+            lambda session: session.query(model).filter(model.state.notin_((State.DONE, State.ABORTED))).all()
+        )
+
+    async def channel(self, channel_id: int) -> Optional[Channel]:
+        return await self.get(Channel, channel_id)
+
+    async def channels_of(self, user_id: int) -> List[Channel]:
+        return await self.run(
+            lambda session: session.query(Channel)
+            .filter(or_(Channel.donator_id == user_id, Channel.searcher_id == user_id))
+            .all()
+        )
+
+    async def categories(self) -> List[Category]:
+        return await self.all(Category)
+
+    async def category_ids(self) -> List[int]:
+        return [category.category_id for category in await self.categories()]
+
+
+repo = Repository()
@@ -0,0 +1,98 @@
+from asyncio import Event, Task, TimeoutError, wait_for, get_running_loop
+from datetime import datetime
+from heapq import heappush, heappop
+from itertools import count
+from typing import Dict, List, Tuple, Callable, Awaitable, Optional
+
+import sentry_sdk
+
+# kind of the deadline, target id (e.g. donator or channel id)
+Key = Tuple[str, int]
+
+
+class DeadlineScheduler:
+    """
+    calls a handler for every deadline once it is due, instead of sweeping all state in fixed intervals
+    every key has at most one deadline, scheduling it again replaces the previous one
+    deadlines of the same kind that are due together are handed to the handler as one batch
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, Key]] = []
+        self._deadlines: Dict[Key, datetime] = {}
+        self._handlers: Dict[str, Callable[[List[int]], Awaitable]] = {}
+        self._counter = count()
+        self._wakeup = Event()
+        self._task: Optional[Task] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def register(self, kind: str, handler: Callable[[List[int]], Awaitable]):
+        self._handlers[kind] = handler
+
+    def schedule(self, kind: str, target: int, due: datetime):
+        key: Key = (kind, target)
+        self._deadlines[key] = due
+        heappush(self._heap, (due, next(self._counter), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, kind: str, target: int):
+        # the heap entry is skipped once it comes up
+        self._deadlines.pop((kind, target), None)
+
+    def due(self, kind: str, target: int) -> Optional[datetime]:
+        return self._deadlines.get((kind, target))
+
+    def pending(self, kind: str) -> int:
+        return sum(key[0] == kind for key in self._deadlines)
+
+    def clear(self):
+        self._heap.clear()
+        self._deadlines.clear()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def pop_due(self, now: datetime) -> Dict[str, List[int]]:
+        """
+        remove all deadlines up to now, grouped by kind
+        """
+        batches: Dict[str, List[int]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            due, _, key = heappop(self._heap)
+            if self._deadlines.get(key) != due:
+                continue  # cancelled or rescheduled
+            del self._deadlines[key]
+            batches.setdefault(key[0], []).append(key[1])
+        return batches
+
+    async def _run(self):
+        while True:
+            now = datetime.utcnow()
+            for kind, targets in self.pop_due(now).items():
+                if handler := self._handlers.get(kind):
+                    get_running_loop().create_task(self._dispatch(handler, targets))
+
+            timeout: Optional[float] = None
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            self._wakeup.clear()
+            try:
+                await wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    @staticmethod
+    async def _dispatch(handler: Callable[[List[int]], Awaitable], targets: List[int]):
+        try:
+            await handler(targets)
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
@@ -1,5 +1,8 @@
 import re
-from typing import Optional
+from asyncio import Semaphore, gather
+from os import getenv
+from time import monotonic
+from typing import Optional, Iterable, Awaitable, List, Any, Dict, Tuple, Type, TypeVar
 
 from PyDrocsid.settings import Settings
 from PyDrocsid.translations import translations
@@ -8,6 +11,17 @@ from discord.ext.commands import ColorConverter, BadArgument
 
 from colours import Colours
 
+T = TypeVar("T")
+
+settings_cache_ttl = getenv("SETTINGS_CACHE_TTL", "60")
+if not settings_cache_ttl.isnumeric():
+    print("SETTINGS_CACHE_TTL should be a number of seconds, using 60")
+    settings_cache_ttl = "60"
+settings_cache_ttl = int(settings_cache_ttl)
+
+# setting name -> (expires at, value)
+_settings_cache: Dict[str, Tuple[float, Any]] = {}
+
 
 class Color(ColorConverter):
     async def convert(self, ctx, argument: str) -> Optional[int]:
@@ -25,9 +39,43 @@ def make_error(message) -> Embed:
     return Embed(title=translations.error, colour=Colours.error, description=str(message))
 
 
+async def gather_limited(coroutines: Iterable[Awaitable], limit: int) -> List[Any]:
+    """
+    await the coroutines with at most `limit` of them running at the same time
+    exceptions are returned in place of the result instead of cancelling the other coroutines
+    """
+
+    semaphore = Semaphore(limit)
+
+    async def run(coroutine: Awaitable):
+        async with semaphore:
+            return await coroutine
+
+    return await gather(*map(run, coroutines), return_exceptions=True)
+
+
+async def get_setting(dtype: Type[T], key: str, default: Optional[T] = None) -> T:
+    """
+    Settings.get with an in-memory cache, entries are kept for SETTINGS_CACHE_TTL seconds
+    the bot never writes settings, changes made in the database show up once the entry has expired or after
+    clear_settings_cache (the reload_settings team command)
+    """
+    entry = _settings_cache.get(key)
+    if entry is not None and monotonic() < entry[0]:
+        return entry[1]
+    value = await Settings.get(dtype, key, default)
+    _settings_cache[key] = monotonic() + settings_cache_ttl, value
+    return value
+
+
+def clear_settings_cache():
+    _settings_cache.clear()
+
+
 async def get_prefix() -> str:
-    return await Settings.get(str, "prefix", ".")
+    return await get_setting(str, "prefix", ".")
 
 #
 # async def set_prefix(new_prefix: str):
 #     await Settings.set(str, "prefix", new_prefix)
+#     _settings_cache.pop("prefix", None)